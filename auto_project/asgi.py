@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auto_project.settings')
 
 application = get_asgi_application()
+
+from carsite.apps import start_background_tasks  # noqa: E402
+
+start_background_tasks()
+
+if settings.LIVE_EVENTS:
+    # Server-Sent Events (/events/...) обслуживаются до Django, без middleware и базы
+    from carsite.live import LiveEventsApp
+
+    application = LiveEventsApp(application)
@@ -81,17 +81,47 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# collectstatic: имена с хешем + сжатые .gz/.br рядом с файлами
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'carsite.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Отдавать статику и медиа из Django (выключить, если перед приложением nginx)
+SERVE_FILES = True
+# Срок кеширования файлов с отпечатком в имени (Cache-Control: immutable)
+FILE_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Адрес сайта для абсолютных ссылок в sitemap.xml и лентах новостей
+SITE_URL = 'http://127.0.0.1:8000'
+# Заранее собранные sitemap.xml и ленты (manage.py build_sitemaps)
+SITEMAP_ROOT = BASE_DIR / 'sitemaps'
+
+# Живые обновления через Server-Sent Events (carsite.live). Работают только под
+# ASGI и доставляют события, сохранённые тем же процессом: включать при запуске
+# одним ASGI-процессом
+LIVE_EVENTS = False
+
+# Проданные и удалённые объявления старше стольких дней уходят в архив (manage.py archive_cars)
+ARCHIVE_AFTER_DAYS = 90
+
 AUTH_USER_MODEL = 'carsite.User'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'carsite.pagination.CarsitePageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    # Бюджеты carsite.throttling.TokenBucketThrottle на клиента и процесс
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '300/min',
+        'search': '60/min',
+        'bulk': '10/min',
+    },
 }
 
 LOGIN_URL = '/accounts/login/'
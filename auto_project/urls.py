@@ -5,14 +5,20 @@ The `urlpatterns` list routes URLs to views. For more information please see:
     https://docs.djangoproject.com/en/6.0/topics/http/urls/
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from carsite.fileserve import file_urlpatterns, serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('carsite.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Без nginx перед приложением статику и медиа отдаёт сам Django
+if settings.SERVE_FILES:
+    urlpatterns += file_urlpatterns(settings.STATIC_URL, settings.STATIC_ROOT)
+    urlpatterns += file_urlpatterns(settings.MEDIA_URL, settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(r'^(?P<path>sitemap(-[\w-]+)?\.xml|news-(rss|atom)\.xml)$', serve,
+                {'document_root': settings.SITEMAP_ROOT}),
+    ]
\ No newline at end of file
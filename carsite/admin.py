@@ -1,15 +1,23 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources
-from .models import User, Brand, Model, Car, CarImage, Favorite, News, Comment
+from .admin_filters import BrandFilter, CarYearFilter, CommentNewsFilter, ModelBrandFilter, NewsAuthorFilter
+from .duplicates import similar_images
+from .models import (
+    User, Brand, Model, Car, CarImage, Favorite, News, Comment, SavedSearch, SearchNotification,
+    ArchivedCar, ArchivedCarImage, ArchivedCarHistory,
+)
 
 
 class CarResource(resources.ModelResource):
     class Meta:
         model = Car
-        fields = ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'status', 'created_at')
-        export_order = ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'status', 'created_at')
+        fields = ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'vin', 'status', 'created_at')
+        export_order = ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'vin', 'status', 'created_at')
+        # full_clean() вызывает Car.clean() с проверкой VIN. Строки сохраняются
+        # по очереди, поэтому повтор VIN внутри файла тоже найдётся
+        clean_model_instances = True
 
 
 class CarImageInline(admin.TabularInline):
@@ -24,22 +32,39 @@ class CarAdmin(ImportExportModelAdmin):
     resource_class = CarResource
     list_display = ['id', 'model', 'price_rub', 'year', 'status_badge', 'owner_link', 'created_at']
     list_display_links = ['id', 'model']
-    list_filter = ['status', 'year', 'created_at', 'model__brand']
+    # Варианты фильтров и date_hierarchy берутся из кеша (admin_cache), а не из DISTINCT по таблице
+    list_filter = ['status', CarYearFilter, 'created_at', BrandFilter]
     search_fields = ['model__name', 'model__brand__name', 'vin']
     date_hierarchy = 'created_at'
+    # import-export подставит его базовым шаблоном под свои кнопки
+    change_list_template = 'admin/carsite/change_list.html'
+    show_full_result_count = False
     raw_id_fields = ['user', 'model']
     inlines = [CarImageInline]
     readonly_fields = ['created_at', 'updated_at']
 
     def get_import_resource_kwargs(self, request, *args, **kwargs):
         return {
-            'fields': ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'status', 'created_at'),
+            'fields': ('id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'vin', 'status', 'created_at'),
             'import_id_fields': ('id',), 
         }
 
     def import_action(self, request, *args, **kwargs):
         return super().import_action(request, *args, **kwargs)
 
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is not CarImage:
+            return
+        # Похожее фото не блокирует сохранение (бывают стоковые снимки), а только предупреждает
+        for image in formset.new_objects:
+            matches = similar_images(image.phash, exclude_car_pk=image.car_id)
+            if matches:
+                cars = ', '.join(sorted({f'#{match.car_id}' for match in matches}))
+                self.message_user(
+                    request, f'Фото {image.image_path.name} похоже на фото объявлений {cars}', messages.WARNING,
+                )
+
     @admin.display(description='Цена')
     def price_rub(self, obj):
         return f"{obj.price:,} ₽".replace(',', ' ')
@@ -74,7 +99,7 @@ class BrandAdmin(admin.ModelAdmin):
 @admin.register(Model)
 class ModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'brand', 'cars_count']
-    list_filter = ['brand']
+    list_filter = [ModelBrandFilter]
     search_fields = ['name', 'brand__name']
     raw_id_fields = ['brand']
 
@@ -101,9 +126,10 @@ class CommentInline(admin.StackedInline):
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'published_at', 'comments_count']
-    list_filter = ['published_at', 'author']
+    list_filter = ['published_at', NewsAuthorFilter]
     search_fields = ['title', 'content']
     date_hierarchy = 'published_at'
+    show_full_result_count = False
     raw_id_fields = ['author']
     inlines = [CommentInline]
     readonly_fields = ['created_at', 'updated_at']
@@ -116,8 +142,10 @@ class NewsAdmin(admin.ModelAdmin):
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ['short_text', 'news', 'user', 'created_at']
-    list_filter = ['created_at', 'news']
+    list_filter = ['created_at', CommentNewsFilter]
     search_fields = ['text', 'user__username']
+    list_select_related = ['news', 'user']
+    show_full_result_count = False
     raw_id_fields = ['user', 'news']
     readonly_fields = ['created_at', 'updated_at']
 
@@ -140,4 +168,52 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.display(description='В избранном')
     def favorites_count(self, obj):
-        return obj.favorite_set.count()
\ No newline at end of file
+        return obj.favorite_set.count()
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'brand', 'model', 'price_min', 'price_max', 'year_min', 'year_max', 'status', 'created_at']
+    list_filter = ['status']
+    raw_id_fields = ['user', 'brand', 'model']
+    readonly_fields = ['created_at']
+
+
+@admin.register(SearchNotification)
+class SearchNotificationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'car', 'saved_search', 'is_read', 'created_at']
+    list_filter = ['is_read']
+    raw_id_fields = ['user', 'car', 'saved_search']
+    readonly_fields = ['created_at']
+
+
+class ReadOnlyAdminMixin:
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedCarImageInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedCarImage
+    extra = 0
+    fields = ['image_path', 'is_main', 'uploaded_at']
+
+
+class ArchivedCarHistoryInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedCarHistory
+    extra = 0
+    fields = ['history_date', 'history_type', 'history_user', 'data']
+
+
+@admin.register(ArchivedCar)
+class ArchivedCarAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'model', 'price', 'year', 'status', 'user', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['vin_key']
+    list_select_related = ['model__brand', 'user']
+    inlines = [ArchivedCarImageInline, ArchivedCarHistoryInline]
\ No newline at end of file
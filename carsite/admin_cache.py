@@ -0,0 +1,62 @@
+"""Кеш значений для фильтров админки: годы, марки, авторы, месяцы дат.
+
+Каждый список загружается одним запросом, затем пополняется сигналами
+post_save. Удалённые значения уходят при перезагрузке по истечении
+ADMIN_CACHE_TTL — до этого фильтр может показать пустой вариант.
+"""
+import threading
+import time
+
+from django.utils import timezone
+
+from .models import Car, News
+
+ADMIN_CACHE_TTL = 600
+
+
+class CachedValues:
+    """Множество значений в памяти процесса."""
+
+    def __init__(self, loader, ttl=ADMIN_CACHE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._values = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def values(self):
+        with self._lock:
+            if self._values is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._values = set(self.loader())
+                self._loaded_at = time.monotonic()
+            return sorted(self._values)
+
+    def add(self, value):
+        with self._lock:
+            if self._values is not None:
+                self._values.add(value)
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+
+def month_key(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return value.year, value.month
+
+
+def _months(model, field_name):
+    return lambda: (month_key(value) for value in model._default_manager.order_by().datetimes(field_name, 'month'))
+
+
+car_years = CachedValues(lambda: Car.objects.order_by().values_list('year', flat=True).distinct())
+news_authors = CachedValues(
+    lambda: News.objects.order_by().filter(author__isnull=False).values_list('author_id', 'author__username').distinct()
+)
+
+# (модель, поле date_hierarchy) -> месяцы (год, месяц), в которых есть записи
+date_months = {
+    (Car, 'created_at'): CachedValues(_months(Car, 'created_at')),
+    (News, 'published_at'): CachedValues(_months(News, 'published_at')),
+}
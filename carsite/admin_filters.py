@@ -0,0 +1,88 @@
+from django.contrib import admin
+from django.urls import reverse
+
+from . import admin_cache, reference
+from .models import News
+
+
+class CarYearFilter(admin.SimpleListFilter):
+    title = 'Год выпуска'
+    parameter_name = 'year'
+
+    def lookups(self, request, model_admin):
+        return [(year, year) for year in reversed(admin_cache.car_years.values())]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(year=self.value())
+
+
+class BrandFilter(admin.SimpleListFilter):
+    """Марки из справочника в памяти (carsite.reference)."""
+    title = 'Марка'
+    parameter_name = 'brand'
+    field_path = 'model__brand_id'
+
+    def lookups(self, request, model_admin):
+        return reference.brand_choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_path: self.value()})
+
+
+class ModelBrandFilter(BrandFilter):
+    field_path = 'brand_id'
+
+
+class NewsAuthorFilter(admin.SimpleListFilter):
+    title = 'Автор'
+    parameter_name = 'author'
+
+    def lookups(self, request, model_admin):
+        return admin_cache.news_authors.values()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author_id=self.value())
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Фильтр по внешнему ключу с большим числом значений.
+
+    Вместо списка всех вариантов — поле с подсказками из стандартного
+    admin:autocomplete; запрашивается только подпись выбранного значения.
+    """
+    template = 'admin/carsite/autocomplete_filter.html'
+    field_name = None
+    related_model = None
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value:
+            return []
+        obj = self.related_model._default_manager.filter(pk=value).first()
+        return [(value, str(obj) if obj is not None else value)]
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.field_name}_id': self.value()})
+
+    def choices(self, changelist):
+        opts = changelist.model._meta
+        self.autocomplete_url = (
+            f"{reverse('admin:autocomplete')}?app_label={opts.app_label}"
+            f"&model_name={opts.model_name}&field_name={self.field_name}"
+        )
+        self.query_template = changelist.get_query_string({self.parameter_name: '__ID__'})
+        yield from super().choices(changelist)
+
+
+class CommentNewsFilter(AutocompleteFilter):
+    title = 'Новость'
+    parameter_name = 'news'
+    field_name = 'news'
+    related_model = News
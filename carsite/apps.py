@@ -3,3 +3,20 @@ from django.apps import AppConfig
 
 class CarsiteConfig(AppConfig):
     name = 'carsite'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+
+def start_background_tasks():
+    """Фоновые потоки и запись буферов при остановке — только в процессе сервера.
+
+    Вызывается из auto_project/wsgi.py и asgi.py (runserver тоже грузит wsgi.py).
+    Остальные manage.py-команды
+    и тесты их не запускают и поэтому ничего не пишут в базу при выходе.
+    """
+    from . import counters, matching, sitemaps
+
+    counters.start_background()
+    matching.start_background()
+    sitemaps.start_background()
@@ -0,0 +1,79 @@
+"""Перенос старых проданных и удалённых объявлений в архивные таблицы.
+
+Переносятся сама запись, метаданные фото (файлы остаются на месте),
+история HistoricalCar, счётчик просмотров и история цены. После удаления
+из Car django-simple-history оставляет одну запись «-», по которой ленты
+изменений видят удаление.
+
+Каскадом без переноса удаляются: последнее снижение цены (CarPriceDrop
+нужно только активным объявлениям), избранное пользователей и
+уведомления сохранённых поисков об этом объявлении.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedCar, ArchivedCarHistory, ArchivedCarImage, Car, CarImage, CarPricePoint, CarViewCount
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVED_STATUSES = ['sold', 'deleted']
+CAR_FIELDS = ['id', 'user_id', 'model_id', 'price', 'year', 'mileage', 'description',
+              'vin', 'vin_key', 'status', 'created_at', 'updated_at']
+
+
+def archive_candidates(days=None):
+    """Идёт по индексу car_status_updated_idx (status, updated_at)."""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Car.objects.filter(status__in=ARCHIVED_STATUSES, updated_at__lt=cutoff).order_by('pk')
+
+
+def archive_cars(days=None):
+    """Архивирует подходящие объявления пачками; возвращает их число."""
+    total = 0
+    while True:
+        ids = list(archive_candidates(days).values_list('pk', flat=True)[:ARCHIVE_BATCH_SIZE])
+        if not ids:
+            return total
+        _archive_batch(ids)
+        total += len(ids)
+
+
+@transaction.atomic
+def _archive_batch(ids):
+    HistoricalCar = Car.history.model
+    views = dict(CarViewCount.objects.filter(car_id__in=ids).values_list('car_id', 'views'))
+    price_points = defaultdict(list)
+    for car_id, price, changed_at in CarPricePoint.objects.filter(car_id__in=ids).order_by('changed_at').values_list(
+        'car_id', 'price', 'changed_at',
+    ):
+        price_points[car_id].append({'price': price, 'changed_at': changed_at})
+    ArchivedCar.objects.bulk_create(
+        ArchivedCar(**row, views=views.get(row['id'], 0), price_points=price_points.get(row['id'], []))
+        for row in Car.objects.filter(pk__in=ids).values(*CAR_FIELDS)
+    )
+    ArchivedCarImage.objects.bulk_create(
+        ArchivedCarImage(car_id=car_id, image_path=image_path, is_main=is_main, uploaded_at=uploaded_at, phash=phash)
+        for car_id, image_path, is_main, uploaded_at, phash in CarImage.objects.filter(car_id__in=ids).values_list(
+            'car_id', 'image_path', 'is_main', 'uploaded_at', 'phash',
+        )
+    )
+    history = HistoricalCar.objects.filter(id__in=ids)
+    ArchivedCarHistory.objects.bulk_create(
+        (
+            ArchivedCarHistory(
+                car_id=row['id'],
+                history_date=row.pop('history_date'),
+                history_type=row.pop('history_type'),
+                history_user_id=row.pop('history_user_id'),
+                data=row,
+            )
+            for row in history.order_by('history_date').values()
+        ),
+        batch_size=ARCHIVE_BATCH_SIZE,
+    )
+    history.delete()
+    Car.objects.filter(pk__in=ids).delete()
@@ -0,0 +1,57 @@
+"""Лента изменений объявлений для синхронизации партнёров и приложения.
+
+Строится по HistoricalCar: курсор — history_id последней отданной записи
+(первичный ключ, растёт монотонно), поэтому выборка «после курсора» идёт
+по индексу и стоит столько, сколько изменений, а не объявлений.
+
+Первый запрос без ?since= возвращает только текущий курсор: клиент
+сохраняет его, скачивает /api/cars/ целиком и дальше ходит за изменениями.
+"""
+import base64
+import binascii
+import struct
+
+from .models import Car
+
+CHANGES_PAGE_SIZE = 500
+
+
+def encode_token(history_id):
+    return base64.urlsafe_b64encode(struct.pack('>Q', history_id)).rstrip(b'=').decode()
+
+
+def decode_token(token):
+    """ValueError, если токен испорчен."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        (history_id,) = struct.unpack('>Q', raw)
+    except (binascii.Error, struct.error, UnicodeEncodeError):
+        raise ValueError('Неверный токен since')
+    return history_id
+
+
+def current_token():
+    HistoricalCar = Car.history.model
+    last = HistoricalCar.objects.order_by('-history_id').values_list('history_id', flat=True).first()
+    return encode_token(last or 0)
+
+
+def changes_since(history_id, limit=CHANGES_PAGE_SIZE):
+    """Изменения после курсора: (последняя запись по каждому объявлению, новый курсор, есть ли ещё).
+
+    Несколько правок одного объявления на странице схлопываются в одну.
+    """
+    HistoricalCar = Car.history.model
+    rows = list(
+        HistoricalCar.objects.filter(history_id__gt=history_id)
+        .select_related('model__brand')
+        .order_by('history_id')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        latest.pop(row.id, None)  # сохраняем порядок по последнему изменению
+        latest[row.id] = row
+    next_id = rows[-1].history_id if rows else history_id
+    return list(latest.values()), encode_token(next_id), has_more
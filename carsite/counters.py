@@ -0,0 +1,99 @@
+"""Счётчики просмотров объявлений с буферизацией в памяти.
+
+Просмотр — это только инкремент словаря в памяти процесса. В процессе
+сервера (start_background) раз в VIEW_FLUSH_SECONDS и при остановке
+накопленное записывается в CarViewCount одним пакетным UPSERT, поэтому
+запросы страниц не ждут блокировку записи SQLite. В других процессах
+буфер пишется только явным вызовом flush_views().
+"""
+import atexit
+import threading
+from collections import Counter
+
+from django.db import connection, transaction
+
+from .models import Car, CarViewCount
+
+VIEW_FLUSH_SECONDS = 5
+
+_pending = Counter()
+_lock = threading.Lock()
+_flush_timer = None
+_background = False
+
+
+def start_background():
+    """Вызывается только в процессе сервера (carsite.apps.start_background_tasks)."""
+    global _background
+    _background = True
+    atexit.register(flush_views)
+
+
+def record_view(car_id):
+    with _lock:
+        _pending[car_id] += 1
+        _start_timer()
+
+
+def _start_timer():
+    global _flush_timer
+    if _background and _flush_timer is None:
+        _flush_timer = threading.Timer(VIEW_FLUSH_SECONDS, _flush_in_thread)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def pending_views(car_id):
+    """Ещё не записанные просмотры — чтобы счётчик на странице не отставал."""
+    return _pending.get(car_id, 0)
+
+
+def _flush_in_thread():
+    try:
+        flush_views()
+    finally:
+        connection.close()
+
+
+def flush_views():
+    global _flush_timer
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    if not batch:
+        return
+    try:
+        _write(batch)
+    except Exception:
+        # Например, «database is locked»: вернуть просмотры и повторить позже
+        with _lock:
+            _pending.update(batch)
+            _start_timer()
+        raise
+
+
+def _write(batch):
+    # Объявление могли удалить, пока просмотры копились
+    existing = set(Car.objects.filter(pk__in=batch).values_list('pk', flat=True))
+    rows = [(car_id, views) for car_id, views in batch.items() if car_id in existing]
+    if not rows:
+        return
+    table = connection.ops.quote_name(CarViewCount._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (car_id, views) VALUES (%s, %s) "
+            f"ON CONFLICT (car_id) DO UPDATE SET views = {table}.views + excluded.views",
+            rows,
+        )
+
+
+def most_viewed(limit=20):
+    """Самые просматриваемые активные объявления — по индексу CarViewCount.views."""
+    return (
+        Car.objects.filter(status='active', view_count__views__gt=0)
+        .select_related('model__brand', 'view_count')
+        .order_by('-view_count__views')[:limit]
+    )
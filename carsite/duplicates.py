@@ -0,0 +1,76 @@
+"""Поиск повторно выложенных объявлений по VIN и похожим фотографиям."""
+from django.db.models import Count, Q
+
+from .fingerprints import MAX_HAMMING_DISTANCE, hamming, hash_bands, to_unsigned
+from .models import Car, CarImage
+
+BAND_FIELDS = ['phash_band0', 'phash_band1', 'phash_band2', 'phash_band3']
+
+
+def similar_images(phash, exclude_car_pk=None):
+    """Фото, отличающиеся от хеша не больше чем на MAX_HAMMING_DISTANCE бит.
+
+    Кандидаты выбираются по совпадению любой 16-битной полосы — каждая
+    полоса проиндексирована, — и затем проверяются точным расстоянием.
+    """
+    if phash is None:
+        return []
+    condition = Q()
+    for field, band in zip(BAND_FIELDS, hash_bands(to_unsigned(phash))):
+        condition |= Q(**{field: band})
+    candidates = CarImage.objects.filter(condition).select_related('car')
+    if exclude_car_pk is not None:
+        candidates = candidates.exclude(car_id=exclude_car_pk)
+    return [image for image in candidates if hamming(image.phash, phash) <= MAX_HAMMING_DISTANCE]
+
+
+def vin_clusters():
+    """Группы объявлений с одинаковым VIN: {vin_key: [id, ...]}."""
+    keys = (
+        Car.objects.exclude(vin_key='')
+        .values('vin_key')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('vin_key', flat=True)
+    )
+    clusters = {}
+    for vin_key, car_id in Car.objects.filter(vin_key__in=list(keys)).order_by('vin_key', 'id').values_list('vin_key', 'id'):
+        clusters.setdefault(vin_key, []).append(car_id)
+    return clusters
+
+
+def image_clusters():
+    """Группы объявлений с похожими фото: список множеств id объявлений.
+
+    Фото раскладываются по корзинам каждой полосы хеша; пары сравниваются
+    только внутри корзины, связанные объявления объединяются (union-find).
+    """
+    rows = list(
+        CarImage.objects.filter(phash__isnull=False).values_list('car_id', 'phash', *BAND_FIELDS).iterator()
+    )
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    buckets = {}
+    for index, row in enumerate(rows):
+        for band, value in enumerate(row[2:]):
+            buckets.setdefault((band, value), []).append(index)
+
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                car_a, hash_a = rows[first][:2]
+                car_b, hash_b = rows[second][:2]
+                if car_a != car_b and hamming(hash_a, hash_b) <= MAX_HAMMING_DISTANCE:
+                    parent[find(car_a)] = find(car_b)
+
+    clusters = {}
+    for car_id in parent:
+        clusters.setdefault(find(car_id), set()).add(car_id)
+    return [sorted(cluster) for cluster in clusters.values() if len(cluster) > 1]
@@ -0,0 +1,146 @@
+"""Отдача статики и медиа самим приложением, когда перед ним нет nginx.
+
+Выбирает заранее сжатую версию файла (.br/.gz) по Accept-Encoding,
+отвечает 304 на If-None-Match и поддерживает запросы Range.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import is_fingerprinted
+from .streaming import accepted_encodings, is_asgi, streaming_response
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def file_urlpatterns(prefix, document_root):
+    """Аналог django.conf.urls.static.static(), но работает и без DEBUG."""
+    prefix = urlsplit(prefix).path.lstrip('/')
+    return [
+        re_path(rf'^{re.escape(prefix)}(?P<path>.*)$', serve, {'document_root': document_root}),
+    ]
+
+
+def _pick_variant(request, fullpath):
+    """Возвращает (путь к файлу, Content-Encoding, есть ли сжатые версии)."""
+    accepted = accepted_encodings(request)
+    has_variants = False
+    for encoding, suffix in ENCODINGS:
+        candidate = fullpath + suffix
+        if os.path.isfile(candidate):
+            has_variants = True
+            if encoding in accepted:
+                return candidate, encoding, True
+    return fullpath, None, has_variants
+
+
+def _parse_range(header, size):
+    """Один диапазон bytes=a-b -> (start, end) включительно; None — отдать целиком."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError('пустой суффиксный диапазон')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('диапазон вне файла')
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path, document_root):
+    try:
+        fullpath = safe_join(document_root, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    variant, encoding, has_variants = _pick_variant(request, fullpath)
+    stat = os.stat(variant)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+    if is_fingerprinted(path):
+        headers['Cache-Control'] = f'public, max-age={settings.FILE_CACHE_MAX_AGE}, immutable'
+    else:
+        headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    if has_variants:
+        headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        response = HttpResponseNotModified()
+        for name in ('ETag', 'Cache-Control', 'Vary'):
+            if name in headers:
+                response[name] = headers[name]
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    elif byte_range:
+        start, end = byte_range
+        response = streaming_response(
+            request, _read_range(variant, start, end - start + 1), status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    elif is_asgi(request):
+        # FileResponse под ASGI читается в память целиком
+        response = streaming_response(request, _read_range(variant, 0, size), content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        response = FileResponse(open(variant, 'rb'), content_type=content_type, filename=os.path.basename(fullpath))
+        response['Content-Length'] = size
+
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,38 @@
+import django_filters
+from .models import Car, CarPriceDrop
+
+
+class CarFilter(django_filters.FilterSet):
+    """Фильтры каталога объявлений.
+
+    Каждое поле опирается на один из составных индексов ``Car.Meta.indexes``;
+    проверка планов запросов — ``manage.py explain_car_filters``.
+    """
+    price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+    year_min = django_filters.NumberFilter(field_name='year', lookup_expr='gte')
+    year_max = django_filters.NumberFilter(field_name='year', lookup_expr='lte')
+    mileage_min = django_filters.NumberFilter(field_name='mileage', lookup_expr='gte')
+    mileage_max = django_filters.NumberFilter(field_name='mileage', lookup_expr='lte')
+    # Передаём id, а не ModelChoiceFilter: не нужен лишний запрос на валидацию
+    brand = django_filters.NumberFilter(field_name='model__brand_id')
+    model = django_filters.NumberFilter(field_name='model_id')
+    # Снижение цены не меньше, чем на N процентов: выборка идёт от таблицы
+    # снижений по индексу drop_percent, а не перебором объявлений с JOIN
+    price_drop_min = django_filters.NumberFilter(method='filter_price_drop_min')
+    # ?ordering=-views — по буферизованным счётчикам просмотров (CarViewCount)
+    ordering = django_filters.OrderingFilter(fields=(
+        ('price', 'price'),
+        ('year', 'year'),
+        ('mileage', 'mileage'),
+        ('created_at', 'created_at'),
+        ('view_count__views', 'views'),
+    ))
+
+    class Meta:
+        model = Car
+        fields = ['year', 'status']
+
+    def filter_price_drop_min(self, queryset, name, value):
+        drops = CarPriceDrop.objects.filter(drop_percent__gte=value).values('car_id')
+        return queryset.filter(pk__in=drops)
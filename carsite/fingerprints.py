@@ -0,0 +1,55 @@
+"""Отпечатки объявлений для поиска дублей: нормализованный VIN и dHash фото."""
+import re
+
+from PIL import Image
+
+# В VIN не бывает букв I, O, Q — это почти всегда опечатки вместо 1 и 0
+VIN_TYPOS = str.maketrans({'I': '1', 'O': '0', 'Q': '0'})
+VIN_JUNK_RE = re.compile(r'[^0-9A-Z]')
+
+# 64-битный хеш делится на 4 полосы по 16 бит. Если хеши отличаются
+# не больше чем в 3 битах, хотя бы одна полоса совпадает целиком.
+HASH_BANDS = 4
+BAND_BITS = 16
+MAX_HAMMING_DISTANCE = HASH_BANDS - 1
+
+
+def normalize_vin(vin):
+    return VIN_JUNK_RE.sub('', (vin or '').upper()).translate(VIN_TYPOS)
+
+
+def image_dhash(fileobj):
+    """Разностный хеш 9x8: 64 бита, устойчив к масштабу и пересжатию.
+
+    Возвращает беззнаковое число или None, если файл не читается как картинка.
+    """
+    try:
+        with Image.open(fileobj) as image:
+            pixels = list(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_bands(value):
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (band * BAND_BITS)) & mask for band in range(HASH_BANDS)]
+
+
+def to_signed(value):
+    """BigIntegerField знаковый: храним 64 бита как signed int64."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a, b):
+    return bin(to_unsigned(a) ^ to_unsigned(b)).count('1')
@@ -1,10 +1,59 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import User 
+from . import reference
+from .models import User, Car
 
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(max_length=254, help_text='Обязательное поле.')
 
     class Meta:
         model = User 
-        fields = ('username', 'email', 'password1', 'password2')
\ No newline at end of file
+        fields = ('username', 'email', 'password1', 'password2')
+
+
+class ModelAutocompleteSelect(forms.Select):
+    """<select> только с выбранной моделью; остальные подгружаются по марке.
+
+    Подпись берётся из справочника в памяти, а не из Model.__str__,
+    поэтому отрисовка не делает запросов к базе.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        groups = [(None, [self.create_option(name, '', '---------', not any(value), 0, attrs=attrs)], 0)]
+        for index, item in enumerate(value, start=1):
+            try:
+                info = reference.model_info(int(item))
+            except (TypeError, ValueError):
+                continue
+            if info is not None:
+                groups.append((None, [self.create_option(name, item, info[1], True, index, attrs=attrs)], index))
+        return groups
+
+
+def _brand_choices():
+    return [('', '---------')] + reference.brand_choices()
+
+
+class CarForm(forms.ModelForm):
+    brand = forms.TypedChoiceField(label='Марка', choices=_brand_choices, coerce=int, required=False)
+
+    field_order = ['brand', 'model', 'price', 'year', 'mileage', 'description', 'vin', 'status']
+
+    class Meta:
+        model = Car
+        fields = ['model', 'price', 'year', 'mileage', 'description', 'vin', 'status']
+        widgets = {'model': ModelAutocompleteSelect}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.model_id and 'brand' not in self.initial:
+            info = reference.model_info(self.instance.model_id)
+            if info is not None:
+                self.initial['brand'] = info[0]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        brand, model = cleaned_data.get('brand'), cleaned_data.get('model')
+        if brand and model and model.brand_id != brand:
+            self.add_error('model', 'Модель не относится к выбранной марке')
+        return cleaned_data
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""Живые обновления через Server-Sent Events.
+
+События публикуются в процессный хаб из сигналов моделей и раздаются
+всем подписчикам канала. Событие кодируется один раз, подписчикам
+уходят одни и те же байты, поэтому тысячи открытых вкладок не
+порождают ни запросов к базе, ни повторной отрисовки страниц.
+
+Хаб живёт внутри процесса: подписчики получают только события,
+сохранённые тем же ASGI-процессом. Сохранения из других процессов —
+manage.py-команд (archive_cars, find_duplicates), импорта в админке на
+другом воркере, второго воркера uvicorn — сюда не доходят и подписчикам
+не приходят; страница увидит их только после перезагрузки. Поэтому
+живые обновления включаются настройкой LIVE_EVENTS и имеют смысл при
+одном ASGI-процессе.
+"""
+import asyncio
+import json
+import re
+import threading
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+
+from .streaming import is_asgi
+
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channel, predicate, loop):
+        self.channel = channel
+        self.predicate = predicate
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        # Клиент не успевает читать — закрываем поток, EventSource переподключится
+        self.overflowed = False
+
+    def deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Hub:
+    """Процессный pub/sub: канал -> множество подписок."""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, predicate=None):
+        subscription = Subscription(channel, predicate, asyncio.get_running_loop())
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def publish(self, channel, event, data):
+        """Можно вызывать из любого потока, в том числе из синхронных сигналов."""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        if not subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n".encode()
+        for subscription in subscribers:
+            if subscription.predicate is None or subscription.predicate(data):
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+
+
+hub = Hub()
+
+
+def live_events_enabled(request):
+    """Подключать ли на странице EventSource: под WSGI /events/... нет."""
+    return settings.LIVE_EVENTS and is_asgi(request)
+
+
+def car_event_data(car):
+    return {
+        'id': car.pk,
+        'title': str(car),
+        'url': reverse('carsite:car_detail', args=[car.pk]),
+        'brand_id': car.model.brand_id,
+        'model_id': car.model_id,
+        'price': car.price,
+        'year': car.year,
+        'mileage': car.mileage,
+        'status': car.status,
+    }
+
+
+def comment_event_data(comment):
+    return {
+        'id': comment.pk,
+        'news_id': comment.news_id,
+        'username': comment.user.username,
+        'text': comment.text,
+        'created_at': comment.created_at,
+    }
+
+
+def publish_on_commit(channel, event, build_data):
+    """Публикует событие после коммита; данные собираются, только если есть подписчики."""
+    if not hub.has_subscribers(channel):
+        return
+    data = build_data()
+    transaction.on_commit(lambda: hub.publish(channel, event, data))
+
+
+class CarEventFilter:
+    """Фильтр событий объявлений с теми же параметрами, что и CarFilter."""
+
+    RANGES = {
+        'price_min': ('price', Decimal, '__ge__'),
+        'price_max': ('price', Decimal, '__le__'),
+        'year_min': ('year', int, '__ge__'),
+        'year_max': ('year', int, '__le__'),
+        'mileage_min': ('mileage', int, '__ge__'),
+        'mileage_max': ('mileage', int, '__le__'),
+        'year': ('year', int, '__eq__'),
+        'brand': ('brand_id', int, '__eq__'),
+        'model': ('model_id', int, '__eq__'),
+        'status': ('status', str, '__eq__'),
+    }
+
+    def __init__(self, params):
+        """params — пары из строки запроса; ValueError при неверном значении."""
+        self.checks = []
+        for name, raw in params:
+            if name not in self.RANGES or raw == '':
+                continue
+            field, cast, op = self.RANGES[name]
+            try:
+                value = cast(raw)
+            except (InvalidOperation, ValueError):
+                raise ValueError(f'Неверное значение параметра {name}')
+            self.checks.append((field, cast, op, value))
+
+    def __call__(self, data):
+        for field, cast, op, value in self.checks:
+            if not getattr(cast(data[field]), op)(value):
+                return False
+        return True
+
+
+class LiveEventsApp:
+    """ASGI-обёртка: /events/... обслуживает сама, остальное — Django."""
+
+    CARS_RE = re.compile(r'^/events/cars/$')
+    COMMENTS_RE = re.compile(r'^/events/news/(\d+)/comments/$')
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            if self.CARS_RE.match(path):
+                params = parse_qsl(scope.get('query_string', b'').decode('latin-1'))
+                try:
+                    predicate = CarEventFilter(params)
+                except ValueError as exc:
+                    return await self._error(send, 400, str(exc))
+                return await self._stream(receive, send, 'cars', predicate)
+            match = self.COMMENTS_RE.match(path)
+            if match:
+                return await self._stream(receive, send, f'news:{match.group(1)}', None)
+        return await self.app(scope, receive, send)
+
+    async def _error(self, send, status, message):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+        })
+        await send({'type': 'http.response.body', 'body': message.encode()})
+
+    async def _stream(self, receive, send, channel, predicate):
+        subscription = hub.subscribe(channel, predicate)
+        disconnect = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+            while not subscription.overflowed:
+                get = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {get, disconnect}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnect in done:
+                    get.cancel()
+                    return
+                if get in done:
+                    body = get.result()
+                else:
+                    get.cancel()
+                    body = b': ping\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            hub.unsubscribe(subscription)
+            disconnect.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from carsite.archive import archive_cars
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые проданные и удалённые объявления в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Архивировать объявления, не менявшиеся столько дней')
+
+    def handle(self, *args, **options):
+        count = archive_cars(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"В архив перенесено объявлений: {count}"))
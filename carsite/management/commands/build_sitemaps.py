@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from carsite import sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает sitemap.xml и ленты новостей'
+
+    def handle(self, *args, **options):
+        sitemaps.build_all()
+        self.stdout.write(self.style.SUCCESS('Sitemap и ленты новостей пересобраны'))
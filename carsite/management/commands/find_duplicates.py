@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from carsite.duplicates import image_clusters, vin_clusters
+from carsite.fingerprints import image_dhash
+from carsite.models import CarImage, User
+
+
+class Command(BaseCommand):
+    help = 'Ищет повторно выложенные объявления по VIN и похожим фото'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов для расчёта хешей фото')
+        parser.add_argument('--notify', action='store_true',
+                            help='Отправить отчёт модераторам по почте')
+
+    def handle(self, *args, **options):
+        hashed = self._hash_missing_images(options['workers'])
+        self.stdout.write(f"Посчитаны хеши для {hashed} фото")
+
+        lines = []
+        for vin_key, car_ids in vin_clusters().items():
+            lines.append(f"VIN {vin_key}: объявления {', '.join(f'#{pk}' for pk in car_ids)}")
+        for car_ids in image_clusters():
+            lines.append(f"Похожие фото: объявления {', '.join(f'#{pk}' for pk in car_ids)}")
+
+        if not lines:
+            self.stdout.write(self.style.SUCCESS('Дубликаты не найдены'))
+            return
+        report = '\n'.join(lines)
+        self.stdout.write(report)
+        self.stdout.write(self.style.WARNING(f"Найдено групп дубликатов: {len(lines)}"))
+
+        if options['notify']:
+            emails = list(User.objects.filter(role='moderator').exclude(email='').values_list('email', flat=True))
+            if emails:
+                send_mail('Дубликаты объявлений', report, None, emails)
+                self.stdout.write(f"Отчёт отправлен модераторам: {len(emails)}")
+
+    def _hash_missing_images(self, workers):
+        images = [
+            image for image in CarImage.objects.filter(phash__isnull=True).exclude(image_path='').only('id', 'image_path')
+            if os.path.exists(image.image_path.path)
+        ]
+        if not images:
+            return 0
+        paths = [image.image_path.path for image in images]
+        # Декодирование картинок — основная работа, раскладываем её по ядрам
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hashes = list(executor.map(image_dhash, paths, chunksize=32))
+        for image, value in zip(images, hashes):
+            image.set_phash(value)
+        CarImage.objects.bulk_update(
+            images, ['phash', 'phash_band0', 'phash_band1', 'phash_band2', 'phash_band3'], batch_size=500,
+        )
+        return sum(value is not None for value in hashes)
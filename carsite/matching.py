@@ -0,0 +1,271 @@
+"""Сопоставление новых объявлений с сохранёнными поисками.
+
+Поиски лежат в памяти в инвертированном индексе. Каждый поиск попадает
+ровно в одно «семейство» ключей по самому избирательному условию:
+модель, марка, десятилетие года выпуска, логарифмическая корзина цены
+или общий список. Для нового объявления берутся только списки по его
+ключам, и полная проверка выполняется лишь для этих кандидатов.
+
+Индекс обновляется сигналами SavedSearch этого же процесса. В процессе
+сервера (start_background) фоновый поток строит его при запуске и
+перечитывает раз в SEARCH_INDEX_TTL секунд, потому что сигналы других
+воркеров сюда не доходят; запросы перечитывания не ждут. В остальных
+процессах индекс читается один раз при первом сопоставлении, а
+уведомления пишутся сразу после коммита.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from .models import Car, SavedSearch, SearchNotification
+
+# Год: корзины по десятилетиям, не больше MAX_YEAR_BUCKETS на поиск
+MAX_YEAR_BUCKETS = 5
+# Цена: корзина — floor(log2(цена)), верхняя граница для открытых диапазонов
+MAX_PRICE_BUCKET = 40
+NOTIFICATION_BATCH_SIZE = 500
+# Неполная пачка записывается не позже чем через столько секунд
+NOTIFICATION_FLUSH_SECONDS = 2
+SEARCH_INDEX_TTL = 60
+
+logger = logging.getLogger(__name__)
+
+Subscription = namedtuple('Subscription', [
+    'id', 'user_id', 'brand_id', 'model_id', 'price_min', 'price_max',
+    'year_min', 'year_max', 'mileage_min', 'mileage_max', 'status',
+])
+
+SUBSCRIPTION_FIELDS = Subscription._fields
+
+
+def _subscription(saved_search):
+    """Значения через to_python: после create(price_min='1000') в полях остаются строки."""
+    return Subscription(*(
+        SavedSearch._meta.get_field(field).to_python(getattr(saved_search, field))
+        for field in SUBSCRIPTION_FIELDS
+    ))
+
+
+def _price_bucket(price):
+    return max(int(math.log2(price)), 0) if price >= 1 else 0
+
+
+def _in_range(value, low, high):
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = {}
+        self._keys = {}
+        self._loaded_at = None
+        # Изменения, пришедшие, пока load() читает таблицу
+        self._changes = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+
+    def _index_keys(self, sub):
+        if sub.model_id is not None:
+            return [('model', sub.model_id)]
+        if sub.brand_id is not None:
+            return [('brand', sub.brand_id)]
+        if sub.year_min is not None and sub.year_max is not None:
+            first, last = sub.year_min // 10, sub.year_max // 10
+            if 0 <= last - first < MAX_YEAR_BUCKETS:
+                return [('year', decade) for decade in range(first, last + 1)]
+        if sub.price_min is not None:
+            first = _price_bucket(sub.price_min)
+            last = _price_bucket(sub.price_max) if sub.price_max is not None else MAX_PRICE_BUCKET
+            return [('price', bucket) for bucket in range(first, max(first, last) + 1)]
+        return [('*',)]
+
+    def _car_keys(self, model_id, brand_id, price, year):
+        return [
+            ('model', model_id),
+            ('brand', brand_id),
+            ('year', year // 10),
+            ('price', min(_price_bucket(price), MAX_PRICE_BUCKET)),
+            ('*',),
+        ]
+
+    def load(self):
+        """Читает все поиски в новый индекс и подменяет им текущий.
+
+        Таблица читается без блокировки: match() тем временем работает
+        по старому индексу, а add()/remove() запоминаются и повторяются
+        поверх нового.
+        """
+        with self._load_lock:
+            self._load()
+
+    def _load(self):
+        with self._lock:
+            self._changes = []
+        fresh = SearchIndex()
+        try:
+            for row in SavedSearch.objects.values_list(*SUBSCRIPTION_FIELDS).iterator():
+                fresh._add(Subscription(*row))
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            self._postings, self._keys = fresh._postings, fresh._keys
+            for search_id, sub in self._changes:
+                self._remove(search_id)
+                if sub is not None:
+                    self._add(sub)
+            self._changes = None
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self._load()
+
+    def start_reloading(self, interval=SEARCH_INDEX_TTL):
+        """Фоновый поток: загрузка сразу и затем раз в interval секунд."""
+        thread = threading.Thread(target=self._reload_forever, args=(interval,), name='search-index', daemon=True)
+        thread.start()
+        return thread
+
+    def _reload_forever(self, interval):
+        while True:
+            try:
+                self.load()
+            except Exception:
+                logger.exception('Не удалось перечитать сохранённые поиски')
+            finally:
+                connection.close()
+            time.sleep(interval)
+
+    def _add(self, sub):
+        keys = self._index_keys(sub)
+        self._keys[sub.id] = keys
+        for key in keys:
+            self._postings.setdefault(key, {})[sub.id] = sub
+
+    def add(self, saved_search):
+        sub = _subscription(saved_search)
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((sub.id, sub))
+            if self._loaded_at is None:
+                return  # попадёт в индекс при первой загрузке
+            self._remove(sub.id)
+            self._add(sub)
+
+    def remove(self, search_id):
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((search_id, None))
+            self._remove(search_id)
+
+    def _remove(self, search_id):
+        for key in self._keys.pop(search_id, ()):
+            posting = self._postings.get(key)
+            if posting is not None:
+                posting.pop(search_id, None)
+                if not posting:
+                    del self._postings[key]
+
+    def match(self, car, brand_id):
+        """Возвращает подписки, которым подходит объявление."""
+        self.ensure_loaded()
+        model_id, price, year, mileage = (
+            Car._meta.get_field(field).to_python(getattr(car, field))
+            for field in ('model_id', 'price', 'year', 'mileage')
+        )
+        matches = []
+        with self._lock:
+            candidates = [
+                sub
+                for key in self._car_keys(model_id, brand_id, price, year)
+                for sub in self._postings.get(key, {}).values()
+            ]
+        for sub in candidates:
+            if (
+                sub.user_id != car.user_id
+                and sub.status == car.status
+                and (sub.model_id is None or sub.model_id == model_id)
+                and (sub.brand_id is None or sub.brand_id == brand_id)
+                and _in_range(price, sub.price_min, sub.price_max)
+                and _in_range(year, sub.year_min, sub.year_max)
+                and _in_range(mileage, sub.mileage_min, sub.mileage_max)
+            ):
+                matches.append(sub)
+        return matches
+
+
+search_index = SearchIndex()
+
+_queue = []
+_queue_lock = threading.Lock()
+_flush_timer = None
+_background = False
+
+
+def start_background():
+    """Фоновое перечитывание индекса, запись уведомлений пачками и при остановке.
+
+    Вызывается только в процессе сервера (carsite.apps.start_background_tasks).
+    """
+    global _background
+    _background = True
+    atexit.register(flush_notifications)
+    search_index.start_reloading()
+
+
+def notify_matches(car):
+    """Ставит уведомления в очередь после коммита; запись в базу — пачками."""
+    matches = search_index.match(car, car.model.brand_id)
+    if not matches:
+        return
+    notifications = [
+        SearchNotification(saved_search_id=sub.id, user_id=sub.user_id, car_id=car.pk)
+        for sub in matches
+    ]
+    transaction.on_commit(lambda: _enqueue(notifications))
+
+
+def _enqueue(notifications):
+    global _flush_timer
+    with _queue_lock:
+        _queue.extend(notifications)
+        if _background and len(_queue) < NOTIFICATION_BATCH_SIZE:
+            if _flush_timer is None:
+                _flush_timer = threading.Timer(NOTIFICATION_FLUSH_SECONDS, _flush_in_thread)
+                _flush_timer.daemon = True
+                _flush_timer.start()
+            return
+    flush_notifications()
+
+
+def _flush_in_thread():
+    try:
+        flush_notifications()
+    finally:
+        connection.close()
+
+
+def flush_notifications():
+    global _flush_timer
+    with _queue_lock:
+        batch = _queue[:]
+        _queue.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    if not batch:
+        return
+    # Поиск или объявление могли удалить, пока пачка ждала записи
+    search_ids = set(SavedSearch.objects.filter(pk__in={n.saved_search_id for n in batch}).values_list('pk', flat=True))
+    car_ids = set(Car.objects.filter(pk__in={n.car_id for n in batch}).values_list('pk', flat=True))
+    batch = [n for n in batch if n.saved_search_id in search_ids and n.car_id in car_ids]
+    SearchNotification.objects.bulk_create(batch, batch_size=NOTIFICATION_BATCH_SIZE)
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:35
+
+import carsite.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0003_car_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carimage',
+            name='image_path',
+            field=models.ImageField(upload_to=carsite.storage.FingerprintedUploadTo('cars/'), verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='cover_image',
+            field=models.ImageField(blank=True, upload_to=carsite.storage.FingerprintedUploadTo('news/'), verbose_name='Обложка'),
+        ),
+    ]
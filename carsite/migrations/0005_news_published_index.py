@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0004_fingerprinted_uploads'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-published_at', '-created_at'], name='news_published_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0005_news_published_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_min', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Цена от')),
+                ('price_max', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Цена до')),
+                ('year_min', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Год от')),
+                ('year_max', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Год до')),
+                ('mileage_min', models.PositiveIntegerField(blank=True, null=True, verbose_name='Пробег от')),
+                ('mileage_max', models.PositiveIntegerField(blank=True, null=True, verbose_name='Пробег до')),
+                ('status', models.CharField(choices=[('active', 'Активно'), ('sold', 'Продано'), ('deleted', 'Удалено')], default='active', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='carsite.brand', verbose_name='Марка')),
+                ('model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='carsite.model', verbose_name='Модель')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сохранённый поиск',
+                'verbose_name_plural': 'Сохранённые поиски',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='carsite.car', verbose_name='Объявление')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='carsite.savedsearch', verbose_name='Сохранённый поиск')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Уведомление о поиске',
+                'verbose_name_plural': 'Уведомления о поиске',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+from carsite.fingerprints import normalize_vin
+
+
+def fill_vin_key(apps, schema_editor):
+    Car = apps.get_model('carsite', 'Car')
+    cars = list(Car.objects.exclude(vin='').only('id', 'vin'))
+    for car in cars:
+        car.vin_key = normalize_vin(car.vin)[:17]
+    Car.objects.bulk_update(cars, ['vin_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0006_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='vin_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=17, verbose_name='Ключ VIN'),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='phash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Хеш изображения'),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='phash_band0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='phash_band1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='phash_band2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='phash_band3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalcar',
+            name='vin_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=17, verbose_name='Ключ VIN'),
+        ),
+        migrations.RunPython(fill_vin_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0007_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarViewCount',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_count', serialize=False, to='carsite.car', verbose_name='Объявление')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+            ],
+            options={
+                'verbose_name': 'Просмотры объявления',
+                'verbose_name_plural': 'Просмотры объявлений',
+                'indexes': [models.Index(fields=['-views'], name='car_views_idx')],
+            },
+        ),
+    ]
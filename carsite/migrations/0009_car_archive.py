@@ -0,0 +1,76 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:43
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0008_car_view_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCar',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год выпуска')),
+                ('mileage', models.PositiveIntegerField(verbose_name='Пробег, км')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('vin', models.CharField(blank=True, max_length=17, verbose_name='VIN')),
+                ('vin_key', models.CharField(blank=True, db_index=True, max_length=17, verbose_name='Ключ VIN')),
+                ('status', models.CharField(choices=[('active', 'Активно'), ('sold', 'Продано'), ('deleted', 'Удалено')], max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(verbose_name='Обновлено')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+                ('price_points', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='История цены')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='В архиве с')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='carsite.model', verbose_name='Модель')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Архивное объявление',
+                'verbose_name_plural': 'Архив объявлений',
+                'ordering': ['-archived_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCarHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('history_date', models.DateTimeField(verbose_name='Дата изменения')),
+                ('history_type', models.CharField(max_length=1, verbose_name='Тип изменения')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Снимок')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='carsite.archivedcar', verbose_name='Объявление')),
+                ('history_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+            ],
+            options={
+                'verbose_name': 'История архивного объявления',
+                'verbose_name_plural': 'История архивных объявлений',
+                'ordering': ['history_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCarImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_path', models.CharField(max_length=255, verbose_name='Изображение')),
+                ('is_main', models.BooleanField(default=False, verbose_name='Главное фото')),
+                ('uploaded_at', models.DateTimeField(verbose_name='Загружено')),
+                ('phash', models.BigIntegerField(blank=True, null=True, verbose_name='Хеш изображения')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='carsite.archivedcar', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Фотография архивного объявления',
+                'verbose_name_plural': 'Фотографии архивных объявлений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedcar',
+            index=models.Index(fields=['-archived_at', '-id'], name='archived_car_archived_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:44
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_price_history(apps, schema_editor):
+    Car = apps.get_model('carsite', 'Car')
+    HistoricalCar = apps.get_model('carsite', 'HistoricalCar')
+    CarPricePoint = apps.get_model('carsite', 'CarPricePoint')
+    CarPriceDrop = apps.get_model('carsite', 'CarPriceDrop')
+
+    car_ids = set(Car.objects.values_list('id', flat=True))
+    points, drops, last = [], {}, {}
+    rows = (
+        HistoricalCar.objects.exclude(history_type='-')
+        .order_by('id', 'history_date', 'history_id')
+        .values_list('id', 'price', 'history_date')
+    )
+    for car_id, price, changed_at in rows.iterator():
+        if car_id not in car_ids or last.get(car_id) == price:
+            continue
+        previous_price = last.get(car_id)
+        last[car_id] = price
+        points.append(CarPricePoint(car_id=car_id, price=price, changed_at=changed_at))
+        if previous_price is not None and price < previous_price:
+            drops[car_id] = CarPriceDrop(
+                car_id=car_id,
+                previous_price=previous_price,
+                price=price,
+                drop_percent=((previous_price - price) * 100 / previous_price).quantize(Decimal('0.01')),
+                dropped_at=changed_at,
+            )
+        elif previous_price is not None:
+            drops.pop(car_id, None)
+    CarPricePoint.objects.bulk_create(points, batch_size=500)
+    CarPriceDrop.objects.bulk_create(drops.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carsite', '0009_car_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarPriceDrop',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_drop', serialize=False, to='carsite.car', verbose_name='Объявление')),
+                ('previous_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Прежняя цена')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Новая цена')),
+                ('drop_percent', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Снижение, %')),
+                ('dropped_at', models.DateTimeField(verbose_name='Снижена')),
+            ],
+            options={
+                'verbose_name': 'Снижение цены',
+                'verbose_name_plural': 'Снижения цен',
+                'ordering': ['-dropped_at'],
+                'indexes': [models.Index(fields=['-dropped_at'], name='price_drop_dropped_idx'), models.Index(fields=['drop_percent'], name='price_drop_percent_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CarPricePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('changed_at', models.DateTimeField(verbose_name='Изменена')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_points', to='carsite.car', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Цена объявления',
+                'verbose_name_plural': 'История цен',
+                'ordering': ['changed_at'],
+                'indexes': [models.Index(fields=['car', 'changed_at'], name='price_point_car_idx')],
+            },
+        ),
+        migrations.RunPython(fill_price_history, migrations.RunPython.noop),
+    ]
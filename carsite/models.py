@@ -1,7 +1,11 @@
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from simple_history.models import HistoricalRecords
+from .fingerprints import hash_bands, image_dhash, normalize_vin, to_signed
+from .storage import FingerprintedUploadTo
 
 
 class User(AbstractUser):
@@ -61,6 +65,8 @@ class Car(models.Model):
     mileage = models.PositiveIntegerField(verbose_name=_('Пробег, км'))
     description = models.TextField(blank=True, verbose_name=_('Описание'))
     vin = models.CharField(max_length=17, blank=True, verbose_name=_('VIN'))
+    # Нормализованный VIN для поиска дублей (заполняется в save)
+    vin_key = models.CharField(max_length=17, blank=True, db_index=True, editable=False, verbose_name=_('Ключ VIN'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active', verbose_name=_('Статус'))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Обновлено'))
@@ -71,16 +77,106 @@ class Car(models.Model):
         verbose_name = _('Объявление')
         verbose_name_plural = _('Объявления')
         ordering = ['-created_at']
+        # Составные индексы под фильтры CarFilter (см. carsite/filters.py):
+        # статус первым, диапазонное поле вторым — каталог почти всегда фильтрует status=active.
+        indexes = [
+            models.Index(fields=['-created_at'], name='car_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='car_status_created_idx'),
+            models.Index(fields=['status', 'price'], name='car_status_price_idx'),
+            models.Index(fields=['status', 'year'], name='car_status_year_idx'),
+            models.Index(fields=['status', 'mileage'], name='car_status_mileage_idx'),
+            models.Index(fields=['model', 'status', 'price'], name='car_model_status_price_idx'),
+            # Отбор кандидатов в архив (carsite.archive)
+            models.Index(fields=['status', 'updated_at'], name='car_status_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.model} ({self.year}) — {self.price} ₽"
 
+    def clean(self):
+        # Общая проверка для формы сайта, админки, API (CarSerializer) и импорта (CarResource)
+        super().clean()
+        if self.vin_duplicates().exists():
+            raise ValidationError({'vin': _('Активное объявление с таким VIN уже есть')})
+
+    def vin_duplicates(self):
+        """Другие активные объявления с тем же нормализованным VIN (поиск по индексу vin_key)."""
+        key = normalize_vin(self.vin)[:17]
+        if not key:
+            return Car.objects.none()
+        return Car.objects.filter(vin_key=key, status='active').exclude(pk=self.pk)
+
+    def save(self, *args, **kwargs):
+        self.vin_key = normalize_vin(self.vin)[:17]
+        super().save(*args, **kwargs)
+
+
+class CarViewCount(models.Model):
+    """Накопленные просмотры объявления; пишется пачками из carsite.counters."""
+    car = models.OneToOneField(Car, primary_key=True, related_name='view_count', on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    views = models.PositiveIntegerField(default=0, verbose_name=_('Просмотров'))
+
+    class Meta:
+        verbose_name = _('Просмотры объявления')
+        verbose_name_plural = _('Просмотры объявлений')
+        indexes = [
+            models.Index(fields=['-views'], name='car_views_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.car_id}: {self.views}"
+
+
+class CarPricePoint(models.Model):
+    """Точка истории цены: пишется только при изменении цены объявления."""
+    car = models.ForeignKey(Car, related_name='price_points', on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name=_('Цена'))
+    changed_at = models.DateTimeField(verbose_name=_('Изменена'))
+
+    class Meta:
+        verbose_name = _('Цена объявления')
+        verbose_name_plural = _('История цен')
+        ordering = ['changed_at']
+        indexes = [
+            models.Index(fields=['car', 'changed_at'], name='price_point_car_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.car_id}: {self.price} ({self.changed_at:%d.%m.%Y})"
+
+
+class CarPriceDrop(models.Model):
+    """Последнее снижение цены; строка удаляется, если цена снова выросла."""
+    car = models.OneToOneField(Car, primary_key=True, related_name='price_drop', on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    previous_price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name=_('Прежняя цена'))
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name=_('Новая цена'))
+    drop_percent = models.DecimalField(max_digits=5, decimal_places=2, verbose_name=_('Снижение, %'))
+    dropped_at = models.DateTimeField(verbose_name=_('Снижена'))
+
+    class Meta:
+        verbose_name = _('Снижение цены')
+        verbose_name_plural = _('Снижения цен')
+        ordering = ['-dropped_at']
+        indexes = [
+            models.Index(fields=['-dropped_at'], name='price_drop_dropped_idx'),
+            models.Index(fields=['drop_percent'], name='price_drop_percent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.car_id}: −{self.drop_percent}%"
+
 
 class CarImage(models.Model):
     car = models.ForeignKey(Car, related_name='images', on_delete=models.CASCADE, verbose_name=_('Объявление'))
-    image_path = models.ImageField(upload_to='cars/', verbose_name=_('Изображение'))
+    image_path = models.ImageField(upload_to=FingerprintedUploadTo('cars/'), verbose_name=_('Изображение'))
     is_main = models.BooleanField(default=False, verbose_name=_('Главное фото'))
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Загружено'))
+    # Перцептивный хеш (dHash) и его 16-битные полосы для поиска похожих фото
+    phash = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name=_('Хеш изображения'))
+    phash_band0 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    phash_band1 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    phash_band2 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    phash_band3 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
 
     class Meta:
         verbose_name = _('Фотография автомобиля')
@@ -89,6 +185,22 @@ class CarImage(models.Model):
     def __str__(self):
         return f"Фото для {self.car} ({'главное' if self.is_main else 'доп.'})"
 
+    def save(self, *args, **kwargs):
+        # Новый файл ещё не записан в хранилище — считаем хеш по загруженным данным
+        if self.image_path and not self.image_path._committed:
+            upload = self.image_path.file
+            self.set_phash(image_dhash(upload))
+            upload.seek(0)
+        super().save(*args, **kwargs)
+
+    def set_phash(self, value):
+        if value is None:
+            self.phash = None
+            self.phash_band0 = self.phash_band1 = self.phash_band2 = self.phash_band3 = None
+            return
+        self.phash = to_signed(value)
+        self.phash_band0, self.phash_band1, self.phash_band2, self.phash_band3 = hash_bands(value)
+
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('Пользователь'))
@@ -108,7 +220,7 @@ class News(models.Model):
     title = models.CharField(max_length=255, verbose_name=_('Заголовок'))
     content = models.TextField(verbose_name=_('Текст'))
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name=_('Автор'))
-    cover_image = models.ImageField(upload_to='news/', blank=True, verbose_name=_('Обложка'))
+    cover_image = models.ImageField(upload_to=FingerprintedUploadTo('news/'), blank=True, verbose_name=_('Обложка'))
     published_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Опубликовано'))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Обновлено'))
@@ -117,6 +229,9 @@ class News(models.Model):
         verbose_name = _('Новость')
         verbose_name_plural = _('Новости')
         ordering = ['-published_at', '-created_at']
+        indexes = [
+            models.Index(fields=['-published_at', '-created_at'], name='news_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -135,4 +250,111 @@ class Comment(models.Model):
         ordering = ['created_at']
 
     def __str__(self):
-        return f"Комментарий от {self.user} к «{self.news.title}»"
\ No newline at end of file
+        return f"Комментарий от {self.user} к «{self.news.title}»"
+
+
+class SavedSearch(models.Model):
+    user = models.ForeignKey(User, related_name='saved_searches', on_delete=models.CASCADE, verbose_name=_('Пользователь'))
+    brand = models.ForeignKey(Brand, null=True, blank=True, on_delete=models.CASCADE, verbose_name=_('Марка'))
+    model = models.ForeignKey(Model, null=True, blank=True, on_delete=models.CASCADE, verbose_name=_('Модель'))
+    price_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name=_('Цена от'))
+    price_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name=_('Цена до'))
+    year_min = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Год от'))
+    year_max = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Год до'))
+    mileage_min = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Пробег от'))
+    mileage_max = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Пробег до'))
+    status = models.CharField(max_length=20, choices=Car.STATUS_CHOICES, default='active', verbose_name=_('Статус'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создан'))
+
+    class Meta:
+        verbose_name = _('Сохранённый поиск')
+        verbose_name_plural = _('Сохранённые поиски')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Поиск #{self.pk} пользователя {self.user_id}"
+
+
+class SearchNotification(models.Model):
+    saved_search = models.ForeignKey(SavedSearch, related_name='notifications', on_delete=models.CASCADE, verbose_name=_('Сохранённый поиск'))
+    user = models.ForeignKey(User, related_name='search_notifications', on_delete=models.CASCADE, verbose_name=_('Пользователь'))
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    is_read = models.BooleanField(default=False, verbose_name=_('Прочитано'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+
+    class Meta:
+        verbose_name = _('Уведомление о поиске')
+        verbose_name_plural = _('Уведомления о поиске')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ← {self.car}"
+
+
+class ArchivedCar(models.Model):
+    """Проданное или удалённое объявление, вынесенное из горячей таблицы Car.
+
+    id совпадает с id исходного объявления.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name=_('ID'))
+    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+', verbose_name=_('Владелец'))
+    model = models.ForeignKey(Model, on_delete=models.PROTECT, related_name='+', verbose_name=_('Модель'))
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name=_('Цена'))
+    year = models.PositiveSmallIntegerField(verbose_name=_('Год выпуска'))
+    mileage = models.PositiveIntegerField(verbose_name=_('Пробег, км'))
+    description = models.TextField(blank=True, verbose_name=_('Описание'))
+    vin = models.CharField(max_length=17, blank=True, verbose_name=_('VIN'))
+    vin_key = models.CharField(max_length=17, blank=True, db_index=True, verbose_name=_('Ключ VIN'))
+    status = models.CharField(max_length=20, choices=Car.STATUS_CHOICES, verbose_name=_('Статус'))
+    created_at = models.DateTimeField(verbose_name=_('Создано'))
+    updated_at = models.DateTimeField(verbose_name=_('Обновлено'))
+    views = models.PositiveIntegerField(default=0, verbose_name=_('Просмотров'))
+    # Точки CarPricePoint: [{"price": ..., "changed_at": ...}, ...]
+    price_points = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name=_('История цены'))
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_('В архиве с'))
+
+    class Meta:
+        verbose_name = _('Архивное объявление')
+        verbose_name_plural = _('Архив объявлений')
+        ordering = ['-archived_at', '-id']
+        indexes = [
+            models.Index(fields=['-archived_at', '-id'], name='archived_car_archived_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} ({self.year}) — {self.price} ₽ [архив]"
+
+
+class ArchivedCarImage(models.Model):
+    car = models.ForeignKey(ArchivedCar, related_name='images', on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    image_path = models.CharField(max_length=255, verbose_name=_('Изображение'))
+    is_main = models.BooleanField(default=False, verbose_name=_('Главное фото'))
+    uploaded_at = models.DateTimeField(verbose_name=_('Загружено'))
+    phash = models.BigIntegerField(null=True, blank=True, verbose_name=_('Хеш изображения'))
+
+    class Meta:
+        verbose_name = _('Фотография архивного объявления')
+        verbose_name_plural = _('Фотографии архивных объявлений')
+
+    def __str__(self):
+        return self.image_path
+
+
+class ArchivedCarHistory(models.Model):
+    """Запись истории HistoricalCar, перенесённая в архив как JSON-снимок."""
+    car = models.ForeignKey(ArchivedCar, related_name='history', on_delete=models.CASCADE, verbose_name=_('Объявление'))
+    history_date = models.DateTimeField(verbose_name=_('Дата изменения'))
+    history_type = models.CharField(max_length=1, verbose_name=_('Тип изменения'))
+    history_user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+', verbose_name=_('Кто изменил'))
+    data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name=_('Снимок'))
+
+    class Meta:
+        verbose_name = _('История архивного объявления')
+        verbose_name_plural = _('История архивных объявлений')
+        ordering = ['history_date']
+
+    def __str__(self):
+        return f"{self.car_id} {self.history_type} {self.history_date}"
\ No newline at end of file
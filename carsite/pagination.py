@@ -0,0 +1,28 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+
+class CarsitePageNumberPagination(PageNumberPagination):
+    """Постраничная навигация API с размером страницы из ?page_size=."""
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset_lazy(self, queryset, request, view=None):
+        """Как paginate_queryset, но возвращает срез queryset без выборки строк.
+
+        Нужен для потоковой отдачи: строки читаются по мере сериализации.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        return self.page.object_list
@@ -0,0 +1,51 @@
+"""История цен объявлений и витрина снижений цены."""
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import CarPriceDrop, CarPricePoint
+
+
+def drop_percent(previous_price, price):
+    return ((previous_price - price) * 100 / previous_price).quantize(Decimal('0.01'))
+
+
+def record_price(car):
+    """Добавляет точку, если цена изменилась, и обновляет CarPriceDrop.
+
+    Один запрос по индексу (car, changed_at) на сохранение объявления.
+    """
+    price = Decimal(car.price)
+    previous_price = (
+        CarPricePoint.objects.filter(car=car).order_by('-changed_at', '-id').values_list('price', flat=True).first()
+    )
+    if previous_price == price:
+        return
+    now = timezone.now()
+    CarPricePoint.objects.create(car=car, price=price, changed_at=now)
+    if previous_price is not None and price < previous_price:
+        CarPriceDrop.objects.update_or_create(car=car, defaults={
+            'previous_price': previous_price,
+            'price': price,
+            'drop_percent': drop_percent(previous_price, price),
+            'dropped_at': now,
+        })
+    elif previous_price is not None:
+        CarPriceDrop.objects.filter(car=car).delete()
+
+
+def price_series(car_id):
+    """Компактный ряд [[время ISO, цена], ...] по возрастанию времени."""
+    return [
+        [changed_at.isoformat(), str(price)]
+        for changed_at, price in CarPricePoint.objects.filter(car_id=car_id)
+        .order_by('changed_at', 'id').values_list('changed_at', 'price')
+    ]
+
+
+def recent_drops():
+    return (
+        CarPriceDrop.objects.filter(car__status='active')
+        .select_related('car__model__brand')
+        .order_by('-dropped_at')
+    )
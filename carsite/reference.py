@@ -0,0 +1,68 @@
+"""Справочник марок и моделей в памяти процесса.
+
+Загружается одним запросом и сбрасывается сигналами Brand/Model. Сигналы
+доходят только до своего процесса, поэтому у кеша есть ещё и срок жизни:
+другие воркеры увидят изменения не позже чем через REFERENCE_TTL секунд.
+"""
+import threading
+import time
+
+from .models import Brand, Model
+
+REFERENCE_TTL = 300
+AUTOCOMPLETE_LIMIT = 200
+
+_lock = threading.Lock()
+_data = None
+_loaded_at = 0.0
+
+
+def _load():
+    brands = list(Brand.objects.order_by('name').values_list('id', 'name'))
+    brand_names = dict(brands)
+    models_by_brand = {}
+    models = {}
+    for model_id, name, brand_id in Model.objects.order_by('name').values_list('id', 'name', 'brand_id'):
+        models_by_brand.setdefault(brand_id, []).append((model_id, name))
+        models[model_id] = (brand_id, f"{brand_names.get(brand_id, '')} {name}")
+    return {'brands': brands, 'models_by_brand': models_by_brand, 'models': models}
+
+
+def _get():
+    global _data, _loaded_at
+    data = _data
+    if data is None or time.monotonic() - _loaded_at > REFERENCE_TTL:
+        with _lock:
+            if _data is None or time.monotonic() - _loaded_at > REFERENCE_TTL:
+                _data = _load()
+                _loaded_at = time.monotonic()
+            data = _data
+    return data
+
+
+def invalidate():
+    global _data
+    with _lock:
+        _data = None
+
+
+def brand_choices():
+    """[(id, название), ...] всех марок по алфавиту."""
+    return _get()['brands']
+
+
+def brand_models(brand_id, query='', limit=AUTOCOMPLETE_LIMIT):
+    """Модели марки, название которых содержит query (без учёта регистра)."""
+    query = query.strip().lower()
+    result = []
+    for model_id, name in _get()['models_by_brand'].get(brand_id, ()):
+        if query in name.lower():
+            result.append((model_id, name))
+            if len(result) >= limit:
+                break
+    return result
+
+
+def model_info(model_id):
+    """(brand_id, «Марка Модель») или None, если модели нет."""
+    return _get()['models'].get(model_id)
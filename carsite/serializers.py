@@ -1,5 +1,10 @@
+import copy
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import Car, News
+from .models import (
+    ArchivedCar, ArchivedCarHistory, ArchivedCarImage, Car, CarPriceDrop, News, SavedSearch, SearchNotification,
+)
 
 
 class CarSerializer(serializers.ModelSerializer):
@@ -15,8 +20,71 @@ class CarSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Цена должна быть положительной")
         return value
 
+    def validate(self, attrs):
+        # Проверки модели (Car.clean) — те же, что у формы сайта, админки и импорта
+        car = copy.copy(self.instance) if self.instance is not None else Car()
+        for field, value in attrs.items():
+            setattr(car, field, value)
+        try:
+            car.clean()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(serializers.as_serializer_error(exc))
+        return attrs
+
 
 class NewsSerializer(serializers.ModelSerializer):
     class Meta:
         model = News
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        exclude = ['user']
+
+    def validate(self, attrs):
+        for field in ('price', 'year', 'mileage'):
+            low, high = attrs.get(f'{field}_min'), attrs.get(f'{field}_max')
+            if low is not None and high is not None and low > high:
+                raise serializers.ValidationError({f'{field}_max': "Верхняя граница меньше нижней"})
+        return attrs
+
+
+class SearchNotificationSerializer(serializers.ModelSerializer):
+    car = CarSerializer(read_only=True)
+
+    class Meta:
+        model = SearchNotification
+        fields = ['id', 'saved_search', 'car', 'is_read', 'created_at']
+        read_only_fields = ['saved_search', 'car', 'created_at']
+
+
+class ArchivedCarImageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedCarImage
+        fields = ['image_path', 'is_main', 'uploaded_at']
+
+
+class ArchivedCarSerializer(serializers.ModelSerializer):
+    brand_name = serializers.CharField(source='model.brand.name', read_only=True)
+    model_name = serializers.CharField(source='model.name', read_only=True)
+    images = ArchivedCarImageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedCar
+        exclude = ['vin_key']
+
+
+class ArchivedCarHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedCarHistory
+        fields = ['history_date', 'history_type', 'history_user', 'data']
+
+
+class CarPriceDropSerializer(serializers.ModelSerializer):
+    car = CarSerializer(read_only=True)
+
+    class Meta:
+        model = CarPriceDrop
+        fields = ['car', 'previous_price', 'price', 'drop_percent', 'dropped_at']
\ No newline at end of file
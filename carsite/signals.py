@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import admin_cache, prices, reference, sitemaps
+from .matching import notify_matches, search_index
+from .live import car_event_data, comment_event_data, publish_on_commit
+from .models import Brand, Car, Comment, Model, News, SavedSearch
+
+
+@receiver([post_save, post_delete], sender=Car)
+def car_changed(sender, instance, **kwargs):
+    sitemaps.schedule('cars', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=News)
+def news_changed(sender, instance, **kwargs):
+    sitemaps.schedule('news', instance.pk)
+
+
+@receiver(post_save, sender=Car)
+def car_saved_live(sender, instance, created, **kwargs):
+    publish_on_commit('cars', 'car_created' if created else 'car_changed', lambda: car_event_data(instance))
+
+
+@receiver(post_delete, sender=Car)
+def car_deleted_live(sender, instance, **kwargs):
+    publish_on_commit('cars', 'car_deleted', lambda: car_event_data(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created_live(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(f'news:{instance.news_id}', 'comment', lambda: comment_event_data(instance))
+
+
+@receiver(post_save, sender=Car)
+def car_saved_match(sender, instance, created, **kwargs):
+    if created:
+        notify_matches(instance)
+
+
+@receiver(post_save, sender=SavedSearch)
+def saved_search_saved(sender, instance, **kwargs):
+    search_index.add(instance)
+
+
+@receiver(post_delete, sender=SavedSearch)
+def saved_search_deleted(sender, instance, **kwargs):
+    search_index.remove(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Brand)
+@receiver([post_save, post_delete], sender=Model)
+def reference_changed(sender, **kwargs):
+    reference.invalidate()
+
+
+@receiver(post_save, sender=Car)
+def car_saved_price(sender, instance, **kwargs):
+    prices.record_price(instance)
+
+
+@receiver(post_save, sender=Car)
+def car_saved_admin_cache(sender, instance, **kwargs):
+    admin_cache.car_years.add(instance.year)
+    admin_cache.date_months[(Car, 'created_at')].add(admin_cache.month_key(instance.created_at))
+
+
+@receiver(post_save, sender=News)
+def news_saved_admin_cache(sender, instance, **kwargs):
+    if instance.author_id is not None:
+        admin_cache.news_authors.add((instance.author_id, instance.author.username))
+    if instance.published_at is not None:
+        admin_cache.date_months[(News, 'published_at')].add(admin_cache.month_key(instance.published_at))
@@ -0,0 +1,243 @@
+"""Заранее собранные sitemap.xml и RSS/Atom-ленты новостей.
+
+Файлы лежат в SITEMAP_ROOT и отдаются как статика. Объявления и новости
+разбиты на куски по диапазонам id, поэтому после сохранения или удаления
+записи пересобирается только её кусок, индекс и (для новостей) ленты.
+В процессе сервера (start_background) пересборка идёт в фоновом потоке,
+а не в запросе, сохранившем запись; в manage.py-командах — сразу после
+коммита.
+"""
+import atexit
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Car, News
+
+SITEMAP_CHUNK_SIZE = 5000
+FEED_ITEMS = 20
+# Изменения за это время собираются в одну пересборку
+SITEMAP_FLUSH_SECONDS = 2
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+INDEX_NAME = 'sitemap.xml'
+RSS_NAME = 'news-rss.xml'
+ATOM_NAME = 'news-atom.xml'
+
+_pending = set()
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_flush_timer = None
+_background = False
+
+
+def _absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def _write(name, content):
+    root = settings.SITEMAP_ROOT
+    os.makedirs(root, exist_ok=True)
+    # У каждого писателя свой временный файл: параллельные сборки не мешают друг другу
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(root, name))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _remove(name):
+    try:
+        os.remove(os.path.join(settings.SITEMAP_ROOT, name))
+    except FileNotFoundError:
+        pass
+
+
+def _chunk_name(kind, chunk):
+    return f'sitemap-{kind}-{chunk}.xml'
+
+
+def _active_cars():
+    return Car.objects.filter(status='active')
+
+
+def _published_news():
+    return News.objects.filter(published_at__isnull=False)
+
+
+SECTIONS = {
+    'cars': (_active_cars, 'carsite:car_detail'),
+    'news': (_published_news, 'carsite:news_detail'),
+}
+
+
+def build_chunk(kind, chunk):
+    """Пересобирает один кусок sitemap: записи с id в [chunk*N, (chunk+1)*N)."""
+    get_queryset, url_name = SECTIONS[kind]
+    start = chunk * SITEMAP_CHUNK_SIZE
+    rows = (
+        get_queryset()
+        .filter(pk__gte=start, pk__lt=start + SITEMAP_CHUNK_SIZE)
+        .order_by('pk')
+        .values_list('pk', 'updated_at')
+    )
+    stream = StringIO()
+    xml = SimplerXMLGenerator(stream, 'utf-8')
+    xml.startDocument()
+    xml.startElement('urlset', {'xmlns': SITEMAP_NS})
+    count = 0
+    for pk, updated_at in rows.iterator():
+        xml.startElement('url', {})
+        xml.addQuickElement('loc', _absolute(reverse(url_name, args=[pk])))
+        xml.addQuickElement('lastmod', updated_at.date().isoformat())
+        xml.endElement('url')
+        count += 1
+    xml.endElement('urlset')
+    xml.endDocument()
+
+    if count:
+        _write(_chunk_name(kind, chunk), stream.getvalue())
+    else:
+        _remove(_chunk_name(kind, chunk))
+
+
+def build_index():
+    """Индекс собирается по файлам кусков на диске, без запросов к базе."""
+    root = settings.SITEMAP_ROOT
+    names = sorted(
+        name for name in (os.listdir(root) if os.path.isdir(root) else [])
+        if name.startswith('sitemap-') and name.endswith('.xml')
+    )
+    stream = StringIO()
+    xml = SimplerXMLGenerator(stream, 'utf-8')
+    xml.startDocument()
+    xml.startElement('sitemapindex', {'xmlns': SITEMAP_NS})
+    for name in names:
+        mtime = os.path.getmtime(os.path.join(root, name))
+        xml.startElement('sitemap', {})
+        xml.addQuickElement('loc', _absolute(f'/{name}'))
+        xml.addQuickElement('lastmod', datetime.fromtimestamp(mtime, dt_timezone.utc).date().isoformat())
+        xml.endElement('sitemap')
+    xml.endElement('sitemapindex')
+    xml.endDocument()
+    _write(INDEX_NAME, stream.getvalue())
+
+
+def build_feeds():
+    news_list = _published_news().order_by('-published_at', '-created_at')[:FEED_ITEMS]
+    link = _absolute(reverse('carsite:news_list'))
+    for feed_class, name in ((Rss201rev2Feed, RSS_NAME), (Atom1Feed, ATOM_NAME)):
+        feed = feed_class(
+            title='Автокуп — Новости',
+            link=link,
+            description='Новости сайта Автокуп',
+            language=settings.LANGUAGE_CODE,
+            feed_url=_absolute(f'/{name}'),
+        )
+        for news in news_list:
+            item_link = _absolute(reverse('carsite:news_detail', args=[news.pk]))
+            feed.add_item(
+                title=news.title,
+                link=item_link,
+                description=news.content[:500],
+                unique_id=item_link,
+                pubdate=news.published_at,
+                updateddate=news.updated_at,
+            )
+        _write(name, feed.writeString('utf-8'))
+
+
+def build_all():
+    """Полная пересборка: все куски, индекс и ленты."""
+    root = settings.SITEMAP_ROOT
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            if name.startswith('sitemap-') and name.endswith('.xml'):
+                os.remove(os.path.join(root, name))
+    for kind, (get_queryset, _) in SECTIONS.items():
+        pks = get_queryset().order_by().values_list('pk', flat=True)
+        for chunk in sorted({pk // SITEMAP_CHUNK_SIZE for pk in pks.iterator()}):
+            build_chunk(kind, chunk)
+    build_index()
+    build_feeds()
+
+
+def start_background():
+    """Пересборка в фоновом потоке и при остановке процесса.
+
+    Вызывается только в процессе сервера (carsite.apps.start_background_tasks).
+    """
+    global _background
+    _background = True
+    atexit.register(_flush)
+
+
+def schedule(kind, pk):
+    """Помечает кусок устаревшим после коммита транзакции.
+
+    Изменения за SITEMAP_FLUSH_SECONDS (например, импорт) дают одну
+    пересборку каждого затронутого куска. Откаченная транзакция кусок не
+    трогает.
+    """
+    chunk = (kind, pk // SITEMAP_CHUNK_SIZE)
+    transaction.on_commit(lambda: _mark_stale(chunk), robust=True)
+
+
+def _mark_stale(chunk):
+    with _lock:
+        _pending.add(chunk)
+    if _background:
+        _start_timer()
+    else:
+        _flush()
+
+
+def _start_timer():
+    global _flush_timer
+    with _lock:
+        if _flush_timer is None and _pending:
+            _flush_timer = threading.Timer(SITEMAP_FLUSH_SECONDS, _flush_in_thread)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def _flush_in_thread():
+    global _flush_timer
+    with _lock:
+        _flush_timer = None
+    try:
+        _flush()
+    finally:
+        connection.close()
+
+
+def _flush():
+    with _lock:
+        pending = sorted(_pending)
+        _pending.clear()
+    if not pending:
+        return
+    try:
+        with _build_lock:
+            for kind, chunk in pending:
+                build_chunk(kind, chunk)
+            build_index()
+            if any(kind == 'news' for kind, _ in pending):
+                build_feeds()
+    except Exception:
+        # Куски пересоберутся при следующем изменении
+        with _lock:
+            _pending.update(pending)
+        raise
@@ -0,0 +1,72 @@
+import gzip
+import os
+import re
+import uuid
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него создаются только .gz
+    brotli = None
+
+# Имя с отпечатком: «name.<12 hex>.ext» — и у collectstatic, и у загрузок
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+
+
+def is_fingerprinted(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+@deconstructible
+class FingerprintedUploadTo:
+    """upload_to, добавляющий к имени файла уникальный отпечаток.
+
+    Имя загруженного файла больше никогда не повторяется, поэтому медиа
+    можно отдавать с заголовком ``Cache-Control: immutable``.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __call__(self, instance, filename):
+        stem, ext = os.path.splitext(os.path.basename(filename))
+        return f"{self.prefix}{stem}.{uuid.uuid4().hex[:12]}{ext.lower()}"
+
+    def __eq__(self, other):
+        return isinstance(other, FingerprintedUploadTo) and self.prefix == other.prefix
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и заранее сжатыми .gz/.br рядом с оригиналом."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+
+        if dry_run:
+            return
+        # hashed_files — итоговые имена после всех проходов, как в манифесте
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if os.path.splitext(hashed_name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                for compressed_name in self._compress(hashed_name):
+                    yield hashed_name, compressed_name, True
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+        for suffix, compressed in variants:
+            # Сжатая версия, которая не меньше оригинала, бесполезна
+            if len(compressed) >= len(content):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name
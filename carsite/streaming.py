@@ -0,0 +1,170 @@
+"""Потоковая отдача больших JSON-списков API.
+
+Строки сериализуются и отправляются по мере чтения из базы, поэтому
+ответ начинает приходить до выборки последней строки, а в памяти
+воркера держится одна пачка строк, а не вся страница.
+
+Под ASGI Django буферизует синхронные итераторы целиком, поэтому там
+тело отдаётся асинхронным итератором, который забирает каждый кусок
+из синхронного генератора через sync_to_async.
+"""
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сколько строк сериализовать перед отправкой очередного куска
+STREAM_BATCH_SIZE = 50
+
+
+def _dumps(data):
+    return json.dumps(
+        data,
+        cls=JSONEncoder,
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON,
+        separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '),
+    )
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме отключённых через q=0."""
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate_encoding(request):
+    codings = accepted_encodings(request)
+    if brotli is not None and 'br' in codings:
+        return 'br'
+    if 'gzip' in codings:
+        return 'gzip'
+    return None
+
+
+def is_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def _iterate_in_thread(iterator):
+    """Асинхронная обёртка над синхронным генератором.
+
+    thread_sensitive: все шаги идут в одном потоке запроса, поэтому
+    курсор queryset.iterator() остаётся на своём соединении.
+    """
+    get_next = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while True:
+            chunk = await get_next(iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """StreamingHttpResponse, который не буферизуется ни под WSGI, ни под ASGI.
+
+    chunks — синхронный генератор.
+    """
+    if is_asgi(request):
+        chunks = _iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток кусков, сбрасывая компрессор после каждого куска."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 — формат gzip
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    else:
+        yield from chunks
+
+
+class StreamingListMixin:
+    """Потоковый list() для ModelViewSet при запросе JSON.
+
+    Формат ответа совпадает с обычным PageNumberPagination; для
+    Browsable API и других рендереров используется стандартный list().
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.stream_list(self.filter_queryset(self.get_queryset()))
+
+    def stream_list(self, queryset):
+        if not isinstance(self.request.accepted_renderer, JSONRenderer):
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        envelope = None
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'paginate_queryset_lazy'):
+            page = paginator.paginate_queryset_lazy(queryset, self.request, view=self)
+            if page is not None:
+                queryset = page
+                envelope = {
+                    'count': paginator.page.paginator.count,
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                }
+
+        encoding = negotiate_encoding(self.request)
+        chunks = (part.encode() for part in self._render_rows(queryset, envelope))
+        response = streaming_response(
+            self.request, compress_stream(chunks, encoding), content_type='application/json',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
+
+    def _render_rows(self, queryset, envelope):
+        serializer = self.get_serializer()
+        if envelope is not None:
+            yield _dumps(envelope)[:-1] + ',"results":['
+        else:
+            yield '['
+        batch = []
+        for index, obj in enumerate(queryset.iterator(chunk_size=STREAM_BATCH_SIZE)):
+            if index:
+                batch.append(',')
+            batch.append(_dumps(serializer.to_representation(obj)))
+            if len(batch) >= 2 * STREAM_BATCH_SIZE:
+                yield ''.join(batch)
+                batch = []
+        batch.append(']}' if envelope is not None else ']')
+        yield ''.join(batch)
@@ -0,0 +1,89 @@
+"""date_hierarchy для админки по кешу месяцев вместо MIN/MAX и DISTINCT по таблице."""
+import datetime
+
+from django import template
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from carsite.admin_cache import date_months
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def cached_date_hierarchy(cl):
+    field_name = cl.date_hierarchy
+    cache = date_months.get((cl.model, field_name))
+    if cache is None:
+        # Для моделей без кеша — стандартный date_hierarchy
+        return date_hierarchy(cl)
+    months = cache.values()
+
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if not (year_lookup or month_lookup or day_lookup) and months:
+        first, last = months[0], months[-1]
+        if first[0] == last[0]:
+            year_lookup = first[0]
+            if first[1] == last[1]:
+                month_lookup = first[1]
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+        }
+    if year_lookup and month_lookup:
+        # DISTINCT по дням только внутри выбранного месяца (диапазон по индексу)
+        start = datetime.datetime(int(year_lookup), int(month_lookup), 1)
+        end = datetime.datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+        if settings.USE_TZ:
+            start, end = timezone.make_aware(start), timezone.make_aware(end)
+        days = cl.queryset.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).datetimes(field_name, 'day')
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                }
+                for day in days
+            ],
+        }
+    if year_lookup:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month}),
+                    'title': capfirst(formats.date_format(datetime.date(year, month, 1), 'YEAR_MONTH_FORMAT')),
+                }
+                for year, month in months if str(year) == str(year_lookup)
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(year)}), 'title': str(year)}
+            for year in sorted({year for year, _month in months})
+        ],
+    }
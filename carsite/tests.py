@@ -1,3 +1,878 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import tablib
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import admin_cache, archive, changes, counters, live, prices, reference, sitemaps, storage, streaming, views
+from .admin import CarResource
+from .admin_cache import CachedValues
+from .duplicates import similar_images
+from .fileserve import serve
+from .filters import CarFilter
+from .forms import CarForm
+from .live import CarEventFilter, Hub, LiveEventsApp
+from .matching import SUBSCRIPTION_FIELDS, SearchIndex
+from .models import (
+    ArchivedCar, Brand, Car, CarImage, CarPriceDrop, CarPricePoint, CarViewCount, Favorite, Model, News,
+    SavedSearch, User,
+)
+from .storage import CompressedManifestStaticFilesStorage, FingerprintedUploadTo
+from .streaming import compress_stream, negotiate_encoding, streaming_response
+from .templatetags.carsite_admin import cached_date_hierarchy
+from .throttling import TokenBucketStore, TokenBucketThrottle, buckets
+
+
+# Админка рендерится без собранного манифеста статики
+PLAIN_STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def make_car(user, model, **kwargs):
+    data = {'price': 1000000, 'year': 2015, 'mileage': 50000}
+    data.update(kwargs)
+    return Car.objects.create(user=user, model=model, **data)
+
+
+class CatalogueTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('seller', 'seller@example.com', 'pw')
+        cls.other = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        cls.brand = Brand.objects.create(name='BMW')
+        cls.model = Model.objects.create(name='X5', brand=cls.brand)
+        cls.other_brand = Brand.objects.create(name='Audi')
+        cls.other_model = Model.objects.create(name='A6', brand=cls.other_brand)
+
+
+class CarFilterTests(CatalogueTestCase):
+    def filtered(self, **params):
+        return set(CarFilter(params, queryset=Car.objects.all()).qs.values_list('pk', flat=True))
+
+    def test_ranges(self):
+        cheap = make_car(self.user, self.model, price=500000, year=2008, mileage=150000)
+        middle = make_car(self.user, self.model, price=1000000, year=2015, mileage=50000)
+        dear = make_car(self.user, self.other_model, price=3000000, year=2022, mileage=1000, status='sold')
+
+        self.assertEqual(self.filtered(price_min='600000', price_max='1000000'), {middle.pk})
+        self.assertEqual(self.filtered(year_min='2015'), {middle.pk, dear.pk})
+        self.assertEqual(self.filtered(year_max='2008'), {cheap.pk})
+        self.assertEqual(self.filtered(mileage_max='50000'), {middle.pk, dear.pk})
+        self.assertEqual(self.filtered(brand=str(self.brand.pk), status='active'), {cheap.pk, middle.pk})
+        self.assertEqual(self.filtered(model=str(self.other_model.pk)), {dear.pk})
+        self.assertEqual(self.filtered(price_min=''), {cheap.pk, middle.pk, dear.pk})
+
+    def test_filter_combinations_use_indexes(self):
+        out = StringIO()
+        call_command('explain_car_filters', stdout=out)
+        self.assertIn('Индексы используются во всех 512 комбинациях', out.getvalue())
+
+
+class CompressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_post_process_compresses_hashed_files(self):
+        static = CompressedManifestStaticFilesStorage(location=self.root, base_url='/static/')
+        css = 'body { color: red; }\n' * 50
+        static.save('app.css', ContentFile(css))
+        static.save('tiny.js', ContentFile('x'))
+        static.save('logo.png', ContentFile('png data ' * 50))
+        paths = {name: (static, name) for name in ('app.css', 'tiny.js', 'logo.png')}
+
+        processed = [(name, hashed) for name, hashed, done in static.post_process(paths) if done]
+
+        hashed_css = static.stored_name('app.css')
+        self.assertTrue(storage.is_fingerprinted(hashed_css))
+        self.assertIn((hashed_css, hashed_css + '.gz'), processed)
+        with static.open(hashed_css + '.gz') as f:
+            self.assertEqual(gzip.decompress(f.read()).decode(), css)
+        self.assertEqual(static.exists(hashed_css + '.br'), storage.brotli is not None)
+        # Сжатие не уменьшило файл — сжатой копии нет; картинки не сжимаются
+        self.assertFalse(static.exists(static.stored_name('tiny.js') + '.gz'))
+        self.assertFalse(static.exists(static.stored_name('logo.png') + '.gz'))
+
+    def test_upload_names_are_fingerprinted(self):
+        name = FingerprintedUploadTo('cars/')(None, 'Photo.JPG')
+        self.assertTrue(name.startswith('cars/Photo.'))
+        self.assertTrue(name.endswith('.jpg'))
+        self.assertTrue(storage.is_fingerprinted(name))
+        self.assertNotEqual(name, FingerprintedUploadTo('cars/')(None, 'Photo.JPG'))
+
+
+class FileServeTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.root, 'app.abcdef123456.js'), 'wb') as f:
+            f.write(b'0123456789')
+        with open(os.path.join(self.root, 'app.abcdef123456.js.gz'), 'wb') as f:
+            f.write(b'gzipped')
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        return serve(self.factory.get('/static/app.abcdef123456.js', headers=headers), 'app.abcdef123456.js', self.root)
+
+    def body(self, response):
+        content = b''.join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_full_and_not_modified(self):
+        response = self.get()
+        self.assertEqual(self.body(response), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        response = self.get(if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_precompressed_variant(self):
+        response = self.get(accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.body(response), b'gzipped')
+        response = self.get(accept_encoding='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.body(response)
+
+    def test_range(self):
+        response = self.get(range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(self.body(response), b'2345')
+        response = self.get(range='bytes=-3')
+        self.assertEqual(self.body(response), b'789')
+        self.assertEqual(self.get(range='bytes=20-').status_code, 416)
+        # If-Range с чужим ETag — файл целиком
+        response = self.get(range='bytes=2-5', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.body(response)
+
+
+class EncodingTests(SimpleTestCase):
+    def negotiate(self, header):
+        return negotiate_encoding(RequestFactory().get('/', headers={'accept-encoding': header}))
+
+    def test_negotiate(self):
+        self.assertEqual(self.negotiate('gzip, deflate, br'), 'br' if streaming.brotli else 'gzip')
+        self.assertEqual(self.negotiate('gzip'), 'gzip')
+        self.assertIsNone(self.negotiate('identity'))
+        self.assertIsNone(self.negotiate(''))
+        self.assertEqual(self.negotiate('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertIsNone(self.negotiate('gzip; q=0'))
+
+    def test_compress_stream(self):
+        chunks = [b'{"a":', b'1}']
+        self.assertEqual(gzip.decompress(b''.join(compress_stream(iter(chunks), 'gzip'))), b'{"a":1}')
+        self.assertEqual(b''.join(compress_stream(iter(chunks), None)), b'{"a":1}')
+        if streaming.brotli is not None:
+            self.assertEqual(streaming.brotli.decompress(b''.join(compress_stream(iter(chunks), 'br'))), b'{"a":1}')
+
+    def test_asgi_body_is_async(self):
+        response = streaming_response(AsyncRequestFactory().get('/'), (chunk for chunk in [b'a', b'b']))
+        self.assertTrue(response.is_async)
+
+        async def consume():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(consume)(), b'ab')
+        self.assertFalse(streaming_response(RequestFactory().get('/'), (chunk for chunk in [b'a'])).is_async)
+
+
+class StreamingListTests(CatalogueTestCase):
+    def get_json(self, params=None, **headers):
+        response = self.client.get('/api/cars/', params, headers={'accept': 'application/json', **headers})
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response, json.loads(body)
+
+    def test_envelope_matches_pagination(self):
+        cars = [make_car(self.user, self.model, price=1000000 + i) for i in range(12)]
+        response, data = self.get_json({'page': 2})
+        self.assertEqual(data['count'], 12)
+        self.assertIsNone(data['next'])
+        self.assertIn('/api/cars/', data['previous'])
+        self.assertEqual([row['id'] for row in data['results']], [cars[1].pk, cars[0].pk])
+        self.assertEqual(data['results'][0]['brand_name'], 'BMW')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response, data = self.get_json({'page_size': 50, 'price_min': 1000010})
+        self.assertEqual([row['id'] for row in data['results']], [cars[11].pk, cars[10].pk])
+
+    def test_gzip(self):
+        car = make_car(self.user, self.model)
+        response, data = self.get_json(**{'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual([row['id'] for row in data['results']], [car.pk])
+
+
+class SitemapBuildTests(CatalogueTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = self.settings(SITEMAP_ROOT=self.root, SITE_URL='https://example.com')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_build_chunk(self):
+        active = make_car(self.user, self.model)
+        sold = make_car(self.user, self.model, status='sold')
+        sitemaps.build_chunk('cars', 0)
+        content = self.read('sitemap-cars-0.xml')
+        self.assertIn(f'<loc>https://example.com/cars/{active.pk}/</loc>', content)
+        self.assertNotIn(f'/cars/{sold.pk}/', content)
+
+        # Кусок без активных объявлений удаляется
+        Car.objects.filter(pk=active.pk).update(status='sold')
+        sitemaps.build_chunk('cars', 0)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'sitemap-cars-0.xml')))
+
+    def test_build_index(self):
+        make_car(self.user, self.model)
+        sitemaps.build_chunk('cars', 0)
+        sitemaps.build_chunk('news', 0)
+        sitemaps.build_index()
+        content = self.read(sitemaps.INDEX_NAME)
+        self.assertIn('<loc>https://example.com/sitemap-cars-0.xml</loc>', content)
+        self.assertNotIn('sitemap-news', content)
+
+    def test_build_feeds(self):
+        News.objects.create(title='Новый кроссовер', content='Текст', author=self.user, published_at=timezone.now())
+        News.objects.create(title='Черновик', content='Текст', author=self.user)
+        sitemaps.build_feeds()
+        for name in (sitemaps.RSS_NAME, sitemaps.ATOM_NAME):
+            content = self.read(name)
+            self.assertIn('Новый кроссовер', content)
+            self.assertNotIn('Черновик', content)
+
+    def test_rebuild_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            car = make_car(self.user, self.model)
+        # До коммита кусок не помечен и не пересобран
+        self.assertEqual(sitemaps._pending, set())
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'sitemap-cars-0.xml')))
+        for callback in callbacks:
+            callback()
+        self.assertIn(f'/cars/{car.pk}/', self.read('sitemap-cars-0.xml'))
+        self.assertIn('sitemap-cars-0.xml', self.read(sitemaps.INDEX_NAME))
+
+
+class SitemapWriteTests(SimpleTestCase):
+    def test_concurrent_writes(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        errors = []
+
+        def write():
+            try:
+                for _ in range(50):
+                    sitemaps._write('sitemap.xml', '<urlset/>')
+            except OSError as exc:
+                errors.append(exc)
+
+        with self.settings(SITEMAP_ROOT=root):
+            threads = [threading.Thread(target=write) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(root), ['sitemap.xml'])
+
+
+class CarEventFilterTests(SimpleTestCase):
+    CAR = {'price': '900000.00', 'brand_id': 3, 'model_id': 7, 'year': 2015, 'mileage': 1000, 'status': 'active'}
+
+    def test_filter(self):
+        predicate = CarEventFilter([('price_max', '1000000'), ('brand', '3'), ('year_min', ''), ('page', '2')])
+        self.assertTrue(predicate(self.CAR))
+        self.assertFalse(predicate({**self.CAR, 'price': '1500000.00'}))
+        self.assertFalse(predicate({**self.CAR, 'brand_id': 4}))
+        self.assertTrue(CarEventFilter([])(self.CAR))
+
+    def test_bad_value(self):
+        for params in ([('price_min', 'abc')], [('year', '20.5')]):
+            with self.assertRaises(ValueError):
+                CarEventFilter(params)
+
+
+class HubTests(SimpleTestCase):
+    def test_publish(self):
+        hub = Hub()
+
+        async def scenario():
+            cheap = hub.subscribe('cars', CarEventFilter([('price_max', '1000')]))
+            anyone = hub.subscribe('cars')
+            news = hub.subscribe('news:1')
+            hub.publish('cars', 'car_created', {'price': 500, 'title': 'BMW X5'})
+            hub.publish('cars', 'car_created', {'price': 5000, 'title': 'Audi A6'})
+            await asyncio.sleep(0)
+            sizes = [subscription.queue.qsize() for subscription in (cheap, anyone, news)]
+            message = cheap.queue.get_nowait()
+            for subscription in (cheap, anyone, news):
+                hub.unsubscribe(subscription)
+            return sizes, message
+
+        sizes, message = asyncio.run(scenario())
+        self.assertEqual(sizes, [1, 2, 0])
+        self.assertEqual(message, 'event: car_created\ndata: {"price": 500, "title": "BMW X5"}\n\n'.encode())
+        self.assertFalse(hub.has_subscribers('cars'))
+
+
+class LiveEventsAppTests(SimpleTestCase):
+    @staticmethod
+    def scope(path, query=b''):
+        return {'type': 'http', 'path': path, 'query_string': query}
+
+    def call(self, app, scope):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        return sent
+
+    def test_other_paths_go_to_django(self):
+        async def django_app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+
+        sent = self.call(LiveEventsApp(django_app), self.scope('/cars/'))
+        self.assertEqual(sent[0]['status'], 204)
+
+    def test_bad_filter(self):
+        sent = self.call(LiveEventsApp(None), self.scope('/events/cars/', b'price_min=abc'))
+        self.assertEqual(sent[0]['status'], 400)
+
+    def test_stream(self):
+        async def scenario():
+            disconnected = asyncio.Event()
+            sent = []
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if b'event: car_created' in message.get('body', b''):
+                    disconnected.set()
+
+            app = LiveEventsApp(None)
+            task = asyncio.ensure_future(app(self.scope('/events/cars/', b'status=active'), receive, send))
+            while not live.hub.has_subscribers('cars'):
+                await asyncio.sleep(0)
+            live.hub.publish('cars', 'car_created', {'id': 1, 'status': 'sold'})
+            live.hub.publish('cars', 'car_created', {'id': 2, 'status': 'active'})
+            await asyncio.wait_for(task, 5)
+            return sent
+
+        sent = asyncio.run(scenario())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body.count(b'event: car_created'), 1)
+        self.assertIn(b'"id": 2', body)
+        self.assertFalse(live.hub.has_subscribers('cars'))
+
+
+class LiveEventsPageTests(CatalogueTestCase):
+    def render(self, request):
+        response = views.CarListView.as_view()(request)
+        return response.render().content.decode()
+
+    def test_script_only_when_enabled(self):
+        self.assertNotIn('EventSource', self.client.get('/cars/').content.decode())
+        with self.settings(LIVE_EVENTS=True):
+            # Под WSGI (тестовый клиент) /events/... нет — скрипт не нужен
+            self.assertNotIn('EventSource', self.client.get('/cars/').content.decode())
+            self.assertIn('EventSource', self.render(AsyncRequestFactory().get('/cars/')))
+        self.assertNotIn('EventSource', self.render(AsyncRequestFactory().get('/cars/')))
+
+
+class SearchIndexTests(CatalogueTestCase):
+    def matched(self, car, index=None):
+        index = index or SearchIndex()
+        return {sub.id for sub in index.match(car, car.model.brand_id)}
+
+    def test_match(self):
+        by_brand = SavedSearch.objects.create(user=self.other, brand=self.brand)
+        by_model = SavedSearch.objects.create(user=self.other, model=self.model, price_max=1500000)
+        by_years = SavedSearch.objects.create(user=self.other, year_min=2010, year_max=2019)
+        by_price = SavedSearch.objects.create(user=self.other, price_min='500000', price_max='2000000')
+        too_cheap = SavedSearch.objects.create(user=self.other, model=self.model, price_max=500000)
+        other_brand = SavedSearch.objects.create(user=self.other, brand=self.other_brand)
+        sold = SavedSearch.objects.create(user=self.other, brand=self.brand, status='sold')
+        anything = SavedSearch.objects.create(user=self.other)
+
+        car = make_car(self.user, self.model)
+        self.assertEqual(self.matched(car), {by_brand.pk, by_model.pk, by_years.pk, by_price.pk, anything.pk})
+        self.assertNotIn(too_cheap.pk, self.matched(car))
+        self.assertNotIn(other_brand.pk, self.matched(car))
+        self.assertNotIn(sold.pk, self.matched(car))
+
+    def test_own_car_is_not_matched(self):
+        SavedSearch.objects.create(user=self.user, brand=self.brand)
+        self.assertEqual(self.matched(make_car(self.user, self.model)), set())
+
+    def test_add_and_remove(self):
+        index = SearchIndex()
+        car = make_car(self.user, self.model)
+        index.ensure_loaded()
+        search = SavedSearch.objects.create(user=self.other, mileage_max=100000)
+        index.add(search)
+        self.assertEqual([sub.id for sub in index.match(car, self.brand.pk)], [search.pk])
+        index.remove(search.pk)
+        self.assertEqual(index.match(car, self.brand.pk), [])
+
+    def test_changes_during_load_are_replayed(self):
+        index = SearchIndex()
+        kept = SavedSearch.objects.create(user=self.other, brand=self.brand)
+        removed = SavedSearch.objects.create(user=self.other, year_min=2010)
+        rows = list(SavedSearch.objects.values_list(*SUBSCRIPTION_FIELDS))
+        added = SavedSearch.objects.create(user=self.other, model=self.model)
+
+        def read_rows():
+            yield from rows
+            # Пока таблица читалась, один поиск сохранили, а другой удалили
+            index.add(added)
+            index.remove(removed.pk)
+
+        queryset = mock.Mock(**{'iterator.return_value': read_rows()})
+        with mock.patch.object(SavedSearch.objects, 'values_list', return_value=queryset):
+            index.load()
+        self.assertEqual(self.matched(make_car(self.user, self.model), index), {kept.pk, added.pk})
+
+
+class SimilarImagesTests(CatalogueTestCase):
+    BASE = 0xF123456789ABCDEF  # старший бит установлен — проверка знакового хранения
+
+    def add_image(self, car, value):
+        image = CarImage(car=car, image_path='cars/photo.jpg')
+        image.set_phash(value)
+        image.save()
+        return image
+
+    def test_band_lookup(self):
+        original = make_car(self.user, self.model)
+        self.add_image(original, self.BASE)
+        repost = make_car(self.user, self.model)
+
+        near = self.BASE ^ 0b111  # 3 бита в одной полосе
+        self.assertEqual([image.car_id for image in similar_images(near)], [original.pk])
+        spread = self.BASE ^ (1 | 1 << 16 | 1 << 32)  # 3 бита в разных полосах
+        self.assertEqual(len(similar_images(spread)), 1)
+        # 4 бита в одной полосе: кандидат по остальным полосам, но отсеивается расстоянием
+        self.assertEqual(similar_images(self.BASE ^ 0b1111), [])
+        # По биту в каждой полосе: ни одна полоса не совпадает
+        self.assertEqual(similar_images(self.BASE ^ (1 | 1 << 16 | 1 << 32 | 1 << 48)), [])
+        self.assertEqual(similar_images(near, exclude_car_pk=original.pk), [])
+        self.assertEqual(similar_images(None), [])
+        self.assertNotEqual(repost.pk, original.pk)
+
+
+class VinDuplicateTests(CatalogueTestCase):
+    VIN = 'WBA1234567890123'
+    ERROR = 'Активное объявление с таким VIN уже есть'
+
+    def setUp(self):
+        self.existing = make_car(self.user, self.model, vin=self.VIN)
+
+    def form_data(self, vin):
+        return {
+            'brand': self.brand.pk, 'model': self.model.pk, 'price': 900000, 'year': 2016,
+            'mileage': 1000, 'description': '', 'vin': vin, 'status': 'active',
+        }
+
+    def test_site_form(self):
+        self.client.force_login(self.other)
+        response = self.client.post('/cars/create/', self.form_data('wba 1234567890123'))
+        self.assertContains(response, self.ERROR)
+        self.assertEqual(Car.objects.count(), 1)
+
+        own = make_car(self.other, self.model)
+        response = self.client.post(f'/cars/{own.pk}/edit/', self.form_data(self.VIN))
+        self.assertContains(response, self.ERROR)
+        # Своё же объявление дубликатом не считается
+        self.client.force_login(self.user)
+        response = self.client.post(f'/cars/{self.existing.pk}/edit/', self.form_data(self.VIN))
+        self.assertEqual(response.status_code, 302)
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        data = {
+            'user': self.other.pk, 'model': self.model.pk, 'price': '900000', 'year': 2016, 'mileage': 1000,
+            'vin': self.VIN.lower(),
+        }
+        response = client.post('/api/cars/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'vin': [self.ERROR]})
+
+        self.existing.status = 'sold'
+        self.existing.save()
+        self.assertEqual(client.post('/api/cars/', data, format='json').status_code, 201)
+
+    def test_import(self):
+        car = make_car(self.other, self.model)
+        dataset = tablib.Dataset(headers=[
+            'id', 'user__username', 'model__brand__name', 'model__name', 'price', 'year', 'vin', 'status', 'created_at',
+        ])
+        dataset.append([car.pk, 'buyer', 'BMW', 'X5', 900000, 2016, self.VIN, 'active', ''])
+        result = CarResource().import_data(dataset, dry_run=True)
+        self.assertTrue(result.has_validation_errors())
+        self.assertEqual(result.invalid_rows[0].error_dict, {'vin': [self.ERROR]})
+
+    @override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+    def test_admin(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        car = make_car(self.other, self.model)
+        response = self.client.post(f'/admin/carsite/car/{car.pk}/change/', {
+            'user': self.other.pk, 'model': self.model.pk, 'price': 900000, 'year': 2016, 'mileage': 1000,
+            'vin': self.VIN, 'status': 'active', 'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0,
+        })
+        self.assertContains(response, self.ERROR)
+
+
+class ReferenceTests(CatalogueTestCase):
+    def setUp(self):
+        reference.invalidate()
+        self.addCleanup(reference.invalidate)
+
+    def test_lookups_from_memory(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(reference.brand_choices(), [(self.other_brand.pk, 'Audi'), (self.brand.pk, 'BMW')])
+        with self.assertNumQueries(0):
+            self.assertEqual(reference.brand_models(self.brand.pk), [(self.model.pk, 'X5')])
+            self.assertEqual(reference.brand_models(self.brand.pk, 'a'), [])
+            self.assertEqual(reference.model_info(self.other_model.pk), (self.other_brand.pk, 'Audi A6'))
+            self.assertIsNone(reference.model_info(0))
+
+    def test_signals_invalidate(self):
+        reference.brand_choices()
+        x3 = Model.objects.create(name='X3', brand=self.brand)
+        self.assertEqual(reference.brand_models(self.brand.pk), [(x3.pk, 'X3'), (self.model.pk, 'X5')])
+
+    def test_form(self):
+        car = make_car(self.user, self.model)
+        reference.brand_choices()
+        with self.assertNumQueries(0):
+            html = CarForm(instance=car).as_p()
+        self.assertIn(f'<option value="{self.model.pk}" selected>BMW X5</option>', html)
+        self.assertIn(f'<option value="{self.brand.pk}" selected>BMW</option>', html)
+
+        form = CarForm(data={
+            'brand': self.other_brand.pk, 'model': self.model.pk, 'price': 1, 'year': 2015, 'mileage': 0,
+            'status': 'active',
+        })
+        self.assertEqual(form.errors['model'], ['Модель не относится к выбранной марке'])
+
+    def test_autocomplete(self):
+        reference.brand_choices()
+        with self.assertNumQueries(0):
+            response = self.client.get('/cars/models/', {'brand': self.brand.pk, 'q': 'x'})
+        self.assertEqual(response.json(), {'results': [{'id': self.model.pk, 'name': 'X5'}]})
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertEqual(self.client.get('/cars/models/', {'brand': 'abc'}).json(), {'results': []})
+
+
+class ViewCounterTests(CatalogueTestCase):
+    def tearDown(self):
+        counters._pending.clear()
+        counters.flush_views()
+
+    def test_views_are_buffered(self):
+        car = make_car(self.user, self.model)
+        for _ in range(3):
+            self.client.get(f'/cars/{car.pk}/')
+        self.assertFalse(CarViewCount.objects.filter(car=car).exists())
+        self.assertIsNone(counters._flush_timer)
+        self.assertContains(self.client.get(f'/cars/{car.pk}/'), 'Просмотров: 4')
+
+        counters.flush_views()
+        self.assertEqual(CarViewCount.objects.get(car=car).views, 4)
+        counters.record_view(car.pk)
+        counters.flush_views()
+        self.assertEqual(CarViewCount.objects.get(car=car).views, 5)
+
+    def test_most_viewed(self):
+        popular = make_car(self.user, self.model)
+        less = make_car(self.user, self.model)
+        sold = make_car(self.user, self.model, status='sold')
+        make_car(self.user, self.model)
+        deleted = make_car(self.user, self.model)
+        for car, views in ((popular, 5), (less, 2), (sold, 9), (deleted, 1)):
+            for _ in range(views):
+                counters.record_view(car.pk)
+        deleted.delete()
+        counters.flush_views()
+        self.assertFalse(CarViewCount.objects.filter(car_id=deleted.pk).exists())
+        self.assertEqual(list(counters.most_viewed()), [popular, less])
+
+        ids = [car['id'] for car in self.client.get('/api/cars/most_viewed/').json()]
+        self.assertEqual(ids, [popular.pk, less.pk])
+        response = self.client.get('/cars/', {'sort': 'views'})
+        self.assertEqual(list(response.context['car_list'])[:3], [sold, popular, less])
+
+    def test_failed_flush_keeps_counts(self):
+        car = make_car(self.user, self.model)
+        counters.record_view(car.pk)
+        counters.record_view(car.pk)
+        with mock.patch.object(counters, '_write', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                counters.flush_views()
+        self.assertEqual(counters.pending_views(car.pk), 2)
+        counters.record_view(car.pk)
+        counters.flush_views()
+        self.assertEqual(CarViewCount.objects.get(car=car).views, 3)
+        self.assertEqual(counters.pending_views(car.pk), 0)
+
+
+class ArchiveTests(CatalogueTestCase):
+    def test_archive_moves_old_inactive_cars(self):
+        old = make_car(self.user, self.model, vin='WVWZZZ1JZXW000001')
+        old.price = 900000
+        old.save()
+        old.status = 'sold'
+        old.save()
+        CarImage.objects.create(car=old, image_path='cars/old.jpg', is_main=True)
+        CarViewCount.objects.create(car=old, views=7)
+        Car.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=200))
+        recent = make_car(self.user, self.model, status='sold')
+        active = make_car(self.user, self.model)
+        Car.objects.filter(pk=active.pk).update(updated_at=timezone.now() - timedelta(days=200))
+
+        self.assertEqual(archive.archive_cars(days=90), 1)
+
+        self.assertFalse(Car.objects.filter(pk=old.pk).exists())
+        self.assertEqual(set(Car.objects.values_list('pk', flat=True)), {recent.pk, active.pk})
+        archived = ArchivedCar.objects.get(pk=old.pk)
+        self.assertEqual(archived.vin_key, 'WVWZZZ1JZXW000001')
+        self.assertEqual(archived.views, 7)
+        self.assertEqual([point['price'] for point in archived.price_points], ['1000000.00', '900000.00'])
+        self.assertEqual(list(archived.images.values_list('image_path', 'is_main')), [('cars/old.jpg', True)])
+        self.assertEqual(archived.history.count(), 3)
+        # Для ленты изменений остаётся запись об удалении
+        self.assertEqual(list(Car.history.filter(id=old.pk).values_list('history_type', flat=True)), ['-'])
+
+        self.assertEqual(archive.archive_cars(days=90), 0)
+
+
+class ChangesFeedTests(CatalogueTestCase):
+    def test_token_roundtrip(self):
+        self.assertEqual(changes.decode_token(changes.encode_token(12345)), 12345)
+        with self.assertRaises(ValueError):
+            changes.decode_token('not a token')
+
+    def test_changes_after_cursor(self):
+        updated = make_car(self.user, self.model)
+        deleted = make_car(self.user, self.model)
+        token = self.client.get('/api/cars/changes/').json()['next']
+
+        updated.price = 900000
+        updated.save()
+        updated.mileage = 60000
+        updated.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        make_car(self.user, self.model, price=2000000)
+
+        data = self.client.get('/api/cars/changes/', {'since': token}).json()
+        kinds = {change['id']: change['type'] for change in data['changes']}
+        self.assertEqual(len(data['changes']), 3)  # две правки одного объявления схлопнуты
+        self.assertEqual(kinds[updated.pk], 'upsert')
+        self.assertEqual(kinds[deleted_pk], 'delete')
+        self.assertFalse(data['has_more'])
+
+        data = self.client.get('/api/cars/changes/', {'since': data['next']}).json()
+        self.assertEqual(data['changes'], [])
+
+    def test_pages(self):
+        for _ in range(3):
+            make_car(self.user, self.model)
+        rows, token, has_more = changes.changes_since(0, limit=2)
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(has_more)
+        rows, token, has_more = changes.changes_since(changes.decode_token(token), limit=2)
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(has_more)
+
+    def test_bad_token(self):
+        self.assertEqual(self.client.get('/api/cars/changes/', {'since': '***'}).status_code, 400)
+
+
+class PriceDropTests(CatalogueTestCase):
+    def test_drop_maintenance(self):
+        car = make_car(self.user, self.model, price=1000000)
+        car.mileage = 51000
+        car.save()
+        self.assertEqual(CarPricePoint.objects.filter(car=car).count(), 1)
+        self.assertFalse(CarPriceDrop.objects.filter(car=car).exists())
+
+        car.price = 900000
+        car.save()
+        drop = CarPriceDrop.objects.get(car=car)
+        self.assertEqual(drop.previous_price, Decimal('1000000'))
+        self.assertEqual(drop.drop_percent, Decimal('10.00'))
+        self.assertEqual([price for _, price in prices.price_series(car.pk)], ['1000000.00', '900000.00'])
+
+        car.price = 950000
+        car.save()
+        self.assertFalse(CarPriceDrop.objects.filter(car=car).exists())
+        self.assertEqual(CarPricePoint.objects.filter(car=car).count(), 3)
+
+    def test_api(self):
+        buckets.clear()
+        dropped = make_car(self.user, self.model, price=1000000)
+        dropped.price = 700000
+        dropped.save()
+        make_car(self.user, self.model)
+
+        results = self.client.get('/api/cars/price-drops/', {'min_percent': '20'}).json()['results']
+        self.assertEqual([row['car']['id'] for row in results], [dropped.pk])
+        self.assertEqual(self.client.get('/api/cars/price-drops/', {'min_percent': '50'}).json()['count'], 0)
+        for value in ('NaN', 'inf', 'abc'):
+            self.assertEqual(self.client.get('/api/cars/price-drops/', {'min_percent': value}).status_code, 400)
+
+        response = self.client.get('/api/cars/', {'price_drop_min': '20'}, HTTP_ACCEPT='application/json')
+        self.assertIn(f'"id":{dropped.pk},'.encode(), b''.join(response.streaming_content))
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class AdminCacheTests(CatalogueTestCase):
+    def setUp(self):
+        for cache in (admin_cache.car_years, admin_cache.news_authors, *admin_cache.date_months.values()):
+            cache.invalidate()
+        reference.invalidate()
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin_user)
+
+    def test_changelist_filters(self):
+        car = make_car(self.user, self.model, year=2012)
+        make_car(self.user, self.other_model, year=2018)
+        content = self.client.get('/admin/carsite/car/').content.decode()
+        self.assertIn('?year=2012', content)
+        self.assertIn('?year=2018', content)
+        self.assertIn(f'?brand={self.brand.pk}', content)
+        # Записи одного месяца: date_hierarchy сразу раскрывает дни
+        self.assertIn('created_at__day=', content)
+
+        created = timezone.localtime(car.created_at)
+        response = self.client.get('/admin/carsite/car/', {
+            'created_at__year': created.year, 'created_at__month': created.month,
+        })
+        self.assertContains(response, f'created_at__day={created.day}')
+
+    def test_cached_values(self):
+        make_car(self.user, self.model, year=2012)
+        with self.assertNumQueries(1):
+            self.assertEqual(admin_cache.car_years.values(), [2012])
+            self.assertEqual(admin_cache.car_years.values(), [2012])
+        make_car(self.user, self.model, year=2020)
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_cache.car_years.values(), [2012, 2020])
+
+        loads = []
+        cache = CachedValues(lambda: loads.append(1) or [1], ttl=0)
+        cache.values()
+        cache.values()
+        self.assertEqual(len(loads), 2)
+
+    def test_fallback_to_date_hierarchy(self):
+        Favorite.objects.create(user=self.other, car=make_car(self.user, self.model))
+        request = RequestFactory().get('/admin/carsite/favorite/')
+        request.user = self.admin_user
+        model_admin = admin.site._registry[Favorite]
+        changelist = model_admin.get_changelist_instance(request)
+        self.assertEqual(cached_date_hierarchy(changelist), date_hierarchy(changelist))
+
+
+class TokenBucketStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = TokenBucketStore()
+        patcher = mock.patch('carsite.throttling.time.monotonic', return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_wait(self):
+        self.assertEqual(self.store.consume('a', 2, 1.0), 0)
+        self.assertEqual(self.store.consume('a', 2, 1.0), 0)
+        self.assertAlmostEqual(self.store.consume('a', 2, 1.0), 1.0)
+
+    def test_refill(self):
+        for _ in range(2):
+            self.store.consume('a', 2, 1.0)
+        self.clock.return_value = 100.5
+        self.assertAlmostEqual(self.store.consume('a', 2, 1.0), 0.5)
+        self.clock.return_value = 101.0
+        self.assertEqual(self.store.consume('a', 2, 1.0), 0)
+        # Полное ведро не копит больше capacity
+        self.clock.return_value = 1000.0
+        for _ in range(2):
+            self.assertEqual(self.store.consume('a', 2, 1.0), 0)
+        self.assertGreater(self.store.consume('a', 2, 1.0), 0)
+
+    def test_keys_are_independent(self):
+        self.store.consume('a', 1, 1.0)
+        self.assertGreater(self.store.consume('a', 1, 1.0), 0)
+        self.assertEqual(self.store.consume('b', 1, 1.0), 0)
+
+    def test_prune_drops_full_buckets(self):
+        store = TokenBucketStore(max_buckets=2)
+        store.consume('a', 1, 1.0)
+        store.consume('b', 1, 1.0)
+        self.clock.return_value = 200.0
+        store.consume('c', 1, 1.0)
+        self.assertEqual(set(store._buckets), {'c'})
+
+
+class ThrottleApiTests(CatalogueTestCase):
+    def setUp(self):
+        buckets.clear()
+        self.addCleanup(buckets.clear)
+        # Один запрос в минуту в каждой группе
+        patcher = mock.patch.object(TokenBucketThrottle, 'get_rate', return_value=(1, 1 / 60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_after(self):
+        self.assertEqual(self.client.get('/api/cars/').status_code, 200)
+        response = self.client.get('/api/cars/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_scopes_and_clients(self):
+        self.client.get('/api/cars/')
+        self.assertEqual(self.client.get('/api/cars/?search=BMW').status_code, 200)
+        self.assertEqual(self.client.get('/api/cars/expensive/').status_code, 200)
+        self.assertEqual(self.client.get('/api/cars/expensive/').status_code, 429)
+        self.assertEqual(self.client.get('/api/cars/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/cars/').status_code, 200)
@@ -0,0 +1,97 @@
+"""Ограничение частоты запросов к API: token bucket в памяти процесса.
+
+У каждого клиента (API-ключ, пользователь или IP) на каждую группу
+запросов своё ведро: read — обычное чтение, search — запросы с ?search=,
+bulk — тяжёлые выгрузки. Ведро вмещает столько запросов, сколько задано
+в DEFAULT_THROTTLE_RATES за период, и равномерно пополняется. Проверка —
+арифметика под блокировкой, без обращения к базе или кешу.
+
+Вёдра у каждого воркера свои: общий лимит на клиента — ставка из
+настроек, умноженная на число процессов.
+"""
+import threading
+import time
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+# При превышении из словаря выкидываются вёдра, успевшие наполниться
+MAX_BUCKETS = 50000
+
+
+class TokenBucketStore:
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        # ключ -> (токенов, время обновления, когда ведро станет полным)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, per_second):
+        """Списывает токен; возвращает 0, если можно, иначе сколько секунд ждать."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / per_second
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / per_second)
+            return wait
+
+    def _prune(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+    def clear(self):
+        with self._lock:
+            self._buckets = {}
+
+
+buckets = TokenBucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle с выбором группы по запросу.
+
+    Действия из view.throttle_bulk_actions идут в bulk, запросы с
+    параметром поиска — в search, остальное — в read.
+    """
+    store = buckets
+    _rates = {}
+
+    def get_scope(self, request, view):
+        if getattr(view, 'action', None) in getattr(view, 'throttle_bulk_actions', ()):
+            return 'bulk'
+        if request.query_params.get(api_settings.SEARCH_PARAM):
+            return 'search'
+        return 'read'
+
+    def get_client_key(self, request):
+        # request.auth — ключ токен-аутентификации, если она используется
+        if request.auth is not None:
+            return f'key:{request.auth}'
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_rate(self, scope):
+        rate = self._rates.get(scope)
+        if rate is None:
+            num_requests, duration = SimpleRateThrottle.parse_rate(None, api_settings.DEFAULT_THROTTLE_RATES[scope])
+            rate = self._rates[scope] = (num_requests, num_requests / duration)
+        return rate
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        capacity, per_second = self.get_rate(scope)
+        self._wait = self.store.consume(f'{scope}:{self.get_client_key(request)}', capacity, per_second)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
@@ -9,7 +9,10 @@ app_name = 'carsite'
 # API Router
 router = DefaultRouter()
 router.register(r'cars', views.CarViewSet)
+router.register(r'archive/cars', views.ArchivedCarViewSet)
 router.register(r'news', views.NewsViewSet)
+router.register(r'saved-searches', views.SavedSearchViewSet, basename='savedsearch')
+router.register(r'notifications', views.SearchNotificationViewSet, basename='searchnotification')
 
 urlpatterns = [
     # Главная страница
@@ -18,7 +21,9 @@ urlpatterns = [
     # Объявления
     path('cars/', views.CarListView.as_view(), name='car_list'),
     path('cars/<int:pk>/', views.CarDetailView.as_view(), name='car_detail'),
+    path('cars/popular/', views.PopularCarListView.as_view(), name='car_popular'),
     path('cars/create/', views.CarCreateView.as_view(), name='car_create'),
+    path('cars/models/', views.ModelAutocompleteView.as_view(), name='model_autocomplete'),
     path('cars/<int:pk>/edit/', views.CarUpdateView.as_view(), name='car_edit'),
     path('cars/<int:pk>/delete/', views.CarDeleteView.as_view(), name='car_delete'),
 
@@ -3,18 +3,27 @@ from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.views import LoginView, LogoutView 
-from django.db.models import Q
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, mixins, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import DecimalField
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Car, News, Comment
-from .serializers import CarSerializer, NewsSerializer
-from .forms import SignUpForm
+from .models import ArchivedCar, Car, News, Comment, SavedSearch, SearchNotification
+from .serializers import (
+    ArchivedCarHistorySerializer, ArchivedCarSerializer, CarPriceDropSerializer, CarSerializer, NewsSerializer,
+    SavedSearchSerializer, SearchNotificationSerializer,
+)
+from .forms import SignUpForm, CarForm
+from . import changes, counters, live, prices, reference
+from .filters import CarFilter
+from .streaming import StreamingListMixin
+from .throttling import TokenBucketThrottle
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 
@@ -42,15 +51,53 @@ class CarListView(ListView):
     context_object_name = 'car_list'
     ordering = ['-created_at']
     paginate_by = 5 
+    # ?sort=... -> порядок; просмотры — из буферизованных счётчиков CarViewCount
+    SORTS = {
+        'views': ['-view_count__views', '-created_at'],
+    }
+
+    def get_ordering(self):
+        return self.SORTS.get(self.request.GET.get('sort'), self.ordering)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        sort = self.request.GET.get('sort')
+        context['sort'] = sort if sort in self.SORTS else ''
+        context['live_events'] = live.live_events_enabled(self.request)
+        return context
 
 class CarDetailView(DetailView):
     model = Car
     template_name = 'car_detail.html'
 
+    def get_queryset(self):
+        return Car.objects.select_related('model__brand', 'view_count')
+
+    def get_object(self, queryset=None):
+        car = super().get_object(queryset)
+        counters.record_view(car.pk)
+        return car
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['price_history'] = prices.price_series(self.object.pk)
+        stored = getattr(self.object, 'view_count', None)
+        context['views'] = (stored.views if stored else 0) + counters.pending_views(self.object.pk)
+        return context
+
+
+class PopularCarListView(ListView):
+    """Самые просматриваемые объявления."""
+    template_name = 'car_popular.html'
+    context_object_name = 'car_list'
+
+    def get_queryset(self):
+        return counters.most_viewed()
+
 
 class CarCreateView(LoginRequiredMixin, CreateView):
     model = Car
-    fields = ['model', 'price', 'year', 'mileage', 'description', 'vin', 'status']
+    form_class = CarForm
     template_name = 'car_form.html'
     success_url = reverse_lazy('carsite:car_list')
 
@@ -61,7 +108,7 @@ class CarCreateView(LoginRequiredMixin, CreateView):
 
 class CarUpdateView(LoginRequiredMixin, UpdateView):
     model = Car
-    fields = ['model', 'price', 'year', 'mileage', 'description', 'vin', 'status']
+    form_class = CarForm
     template_name = 'car_form.html'
     success_url = reverse_lazy('carsite:car_list')
 
@@ -84,6 +131,23 @@ class CarDeleteView(LoginRequiredMixin, DeleteView):
         return Car.objects.filter(user=self.request.user)
 
 
+class ModelAutocompleteView(View):
+    """Модели выбранной марки для формы объявления (из справочника в памяти)."""
+
+    def get(self, request):
+        try:
+            brand_id = int(request.GET.get('brand', ''))
+        except ValueError:
+            return JsonResponse({'results': []})
+        results = [
+            {'id': model_id, 'name': name}
+            for model_id, name in reference.brand_models(brand_id, request.GET.get('q', ''))
+        ]
+        response = JsonResponse({'results': results})
+        patch_cache_control(response, max_age=60)
+        return response
+
+
 # === Новости ===
 
 class NewsListView(ListView):
@@ -104,6 +168,7 @@ class NewsDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['comments'] = self.object.comments.all().select_related('user')
+        context['live_events'] = live.live_events_enabled(self.request)
         return context
 
 
@@ -175,28 +240,64 @@ class CommentDeleteView(LoginRequiredMixin, DeleteView):
 
 # === API Views ===
 
-class CarViewSet(viewsets.ModelViewSet):
-    queryset = Car.objects.all()
+class CarViewSet(StreamingListMixin, viewsets.ModelViewSet):
+    queryset = Car.objects.select_related('model__brand')
     serializer_class = CarSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['year', 'status']
+    filterset_class = CarFilter
     search_fields = ['model__name', 'model__brand__name']
-
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        year = self.request.query_params.get('year')
-        if year:
-            queryset = queryset.filter(Q(year=year) | Q(status='active'))
-        return queryset
+    throttle_classes = [TokenBucketThrottle]
+    throttle_bulk_actions = {'expensive', 'changes'}
 
     @action(detail=False, methods=['get'])
     def expensive(self, request):
         cars = self.queryset.filter(price__gt=1000000)
-        page = self.paginate_queryset(cars)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(cars, many=True)
+        return self.stream_list(cars)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Изменения с момента ?since=<токен>, включая удаления."""
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'changes': [], 'next': changes.current_token(), 'has_more': False})
+        try:
+            history_id = changes.decode_token(since)
+        except ValueError as exc:
+            raise ValidationError({'since': str(exc)})
+        rows, next_token, has_more = changes.changes_since(history_id)
+        data = []
+        for row in rows:
+            if row.history_type == '-':
+                data.append({'id': row.id, 'type': 'delete', 'car': None})
+            else:
+                data.append({'id': row.id, 'type': 'upsert', 'car': CarSerializer(row, context=self.get_serializer_context()).data})
+        return Response({'changes': data, 'next': next_token, 'has_more': has_more})
+
+    @action(detail=True, methods=['get'], url_path='price-history')
+    def price_history(self, request, pk=None):
+        car = self.get_object()
+        return Response({'id': car.pk, 'points': prices.price_series(car.pk)})
+
+    @action(detail=False, methods=['get'], url_path='price-drops')
+    def price_drops(self, request):
+        """Недавние снижения цен активных объявлений."""
+        drops = prices.recent_drops()
+        min_percent = request.query_params.get('min_percent')
+        if min_percent:
+            # DecimalField отклоняет NaN и бесконечность
+            field = DecimalField(max_digits=None, decimal_places=None)
+            try:
+                value = field.run_validation(min_percent)
+            except ValidationError as exc:
+                raise ValidationError({'min_percent': exc.detail})
+            drops = drops.filter(drop_percent__gte=value)
+        page = self.paginate_queryset(drops)
+        serializer = CarPriceDropSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def most_viewed(self, request):
+        serializer = self.get_serializer(counters.most_viewed(), many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
@@ -207,8 +308,55 @@ class CarViewSet(viewsets.ModelViewSet):
         return Response({'status': 'marked as sold'})
 
 
-class NewsViewSet(viewsets.ModelViewSet):
+class NewsViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = News.objects.all()
     serializer_class = NewsSerializer
     filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'content']
\ No newline at end of file
+    search_fields = ['title', 'content']
+    throttle_classes = [TokenBucketThrottle]
+
+
+class SavedSearchViewSet(viewsets.ModelViewSet):
+    """Сохранённые поиски текущего пользователя."""
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class SearchNotificationViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, viewsets.GenericViewSet):
+    """Уведомления о новых объявлениях по сохранённым поискам."""
+    serializer_class = SearchNotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['is_read']
+
+    def get_queryset(self):
+        return (
+            SearchNotification.objects
+            .filter(user=self.request.user)
+            .select_related('car__model__brand')
+        )
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        return Response({'updated': updated})
+
+
+class ArchivedCarViewSet(viewsets.ReadOnlyModelViewSet):
+    """Архив проданных и удалённых объявлений (только чтение)."""
+    queryset = ArchivedCar.objects.select_related('model__brand').prefetch_related('images')
+    serializer_class = ArchivedCarSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'user', 'model']
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        car = self.get_object()
+        serializer = ArchivedCarHistorySerializer(car.history.all(), many=True)
+        return Response(serializer.data)
\ No newline at end of file